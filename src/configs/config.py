@@ -27,6 +27,17 @@ class Config:
     CAMERA_WIDTH = 640
     CAMERA_HEIGHT = 480
     CAMERA_FPS = 30
+    PIPELINE_CODEC = "png"
+    PIPELINE_PNG_COMPRESSION = 1
+    PIPELINE_JPEG_QUALITY = 90
+    PIPELINE_QUEUE_SIZE = 64
+    PROFILING = False
+    PROFILE_WINDOW = 300
+    PROFILE_REPORT_INTERVAL = 300
+    THREADED_PIPELINE = True
+    FRAME_QUEUE_SIZE = 1
+    SESSION_WORKERS = 4
+    MODEL_WARMUP = True
     PRIMARY_COLOR = (0, 255, 0)
     SECONDARY_COLOR = (255, 165, 0)
     ALERT_COLOR = (0, 0, 255)
@@ -35,6 +46,7 @@ class Config:
     MODEL_DAT = os.path.join(DATA_DIR, "shape_predictor_68_face_landmarks.dat")
     MODEL_DAT_BZ2 = MODEL_DAT + ".bz2"
     MODEL_DAT_URL = "http://dlib.net/files/shape_predictor_68_face_landmarks.dat.bz2"
+    MODEL_MANIFEST = os.path.join(DATA_DIR, "models.json")
     ASSETS_DIR = os.path.join(PROJECT_ROOT, "assets")
     IMAGE_DIR = os.path.join(ASSETS_DIR, "images")
     SOUND_DIR = os.path.join(ASSETS_DIR, "sounds")
@@ -46,8 +58,24 @@ class Config:
     FONT_PATH = os.path.join(FONT_DIR, "ARIAL.TTF")
     DNN_CONFIDENCE_THRESHOLD = 0.5
     DNN_NMS_THRESHOLD = 0.4
+    FACE_DETECTORS = ("dnn", "hog", "haar")
+    FACE_TRACKING = True
+    TRACKING_KEYFRAME_INTERVAL = 10
+    TRACKING_MIN_OVERLAP = 0.6
+    TRACKING_BOX_MARGIN = 0.1
+    ROI_PREPROCESSING = True
+    ROI_PADDING = 0.25
+    ROI_SIZE_STEP = 32
+    CANNY_BACKEND = "vectorized"
+    CANNY_EXACT = True
+    EVAL_CHUNK_WARMUP_FRAMES = 30
+    FEATURE_CACHE = True
+    FEATURE_CACHE_DIR = os.path.join(PROJECT_ROOT, "cache", "landmarks")
     DNN_PROTOTXT = os.path.join(DATA_DIR, "deploy.prototxt")
     DNN_CAFFEMODEL = os.path.join(DATA_DIR, "res10_300x300_ssd_iter_140000.caffemodel")
+    DNN_PROTOTXT_URL = "https://raw.githubusercontent.com/opencv/opencv/master/samples/dnn/face_detector/deploy.prototxt"
+    DNN_CAFFEMODEL_URL = ("https://github.com/opencv/opencv_3rdparty/raw/dnn_samples_face_detector_20170830/"
+                          "res10_300x300_ssd_iter_140000.caffemodel")
     CNN_FACE_MODEL = os.path.join(DATA_DIR, "mmod_human_face_detector.dat")
     CNN_FACE_MODEL_URL = "http://dlib.net/files/mmod_human_face_detector.dat.bz2"
 
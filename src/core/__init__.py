@@ -2,3 +2,9 @@ from src.core.detector import DrowsinessDetector
 from src.core.facial_analyzer import FacialAnalyzer
 from src.core.alert_system import AlertSystem
 from src.core.model_manager import ModelManager
+from src.core.model_registry import ModelRegistry
+from src.core.frame_pipeline import ThreadedDetector
+from src.core.session_manager import SessionManager
+from src.core.multi_stream import MultiStreamDetector
+from src.core.frame_source import (CameraSource, VideoFileSource, ImageDirectorySource,
+                                   MemoryFrameSource, SharedMemoryRingSource, SharedMemoryRingWriter)
@@ -1,85 +1,104 @@
-import cv2
 import numpy as np
 import time
 import logging
+from collections import OrderedDict
 from PIL import Image, ImageDraw, ImageFont
 from src.configs.config import Config
+from src.core.blending import SolidTint
 
 logger = logging.getLogger(__name__)
 
+SPRITE_CACHE_SIZE = 256
+FATIGUE_BANNER_HEIGHT = 50
 
-def _add_weighted(src1, alpha, src2, beta, gamma, dst):
-    dst[:] = np.clip(src1.astype(np.float64) * alpha + src2.astype(np.float64) * beta + gamma, 0, 255).astype(np.uint8)
-    return dst
 
+class _TextSprite:
+    """Text pre-rendered once by PIL: coverage mask cropped to the glyph bbox plus the tint terms."""
 
-def _bgr_to_rgb(bgr):
-    return np.ascontiguousarray(bgr[:, :, ::-1])
+    def __init__(self, font, text, color):
+        left, top, right, bottom = font.getbbox(text)
+        self.offset = (left, top)
+        self.width = right - left
+        self.height = bottom - top
+        mask = Image.new('L', (max(self.width, 1), max(self.height, 1)), 0)
+        ImageDraw.Draw(mask).text((-left, -top), text, font=font, fill=255)
+        alpha = np.asarray(mask, dtype=np.uint16)[:, :, None]
+        self.inv_alpha = 255 - alpha
+        self.tint = alpha * np.array(color, dtype=np.uint16)
 
-
-def _rgb_to_bgr(rgb):
-    return np.ascontiguousarray(rgb[:, :, ::-1])
+    def draw(self, frame, position):
+        x = int(position[0]) + self.offset[0]
+        y = int(position[1]) + self.offset[1]
+        h, w = self.tint.shape[:2]
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + w, frame.shape[1]), min(y + h, frame.shape[0])
+        if x0 >= x1 or y0 >= y1:
+            return frame
+        roi = frame[y0:y1, x0:x1]
+        # dst = (dst * (255 - a) + color * a) / 255, rounded; fits in uint16
+        blended = roi * self.inv_alpha[y0 - y:y1 - y, x0 - x:x1 - x]
+        blended += self.tint[y0 - y:y1 - y, x0 - x:x1 - x]
+        blended += 127
+        blended //= 255
+        roi[:] = blended
+        return frame
 
 
 class AlertSystem:
     def __init__(self):
         self.config = Config()
         self._font_cache = {}
+        self._sprite_cache = OrderedDict()
+        self._drowsiness_tint = SolidTint(self.config.ALERT_COLOR)
+        self._distraction_tint = SolidTint(self.config.SECONDARY_COLOR, 0.3)
+        self._head_tilt_tint = SolidTint((0, 165, 255))
+        self._fatigue_tint = SolidTint((0, 0, 255), 0.7)
 
-    def put_text_unicode(self, frame, text, position, color, font_size):
-        frame_rgb = _bgr_to_rgb(frame)
-        pil_image = Image.fromarray(frame_rgb)
-        draw = ImageDraw.Draw(pil_image)
+    def _font(self, font_size):
         if font_size not in self._font_cache:
             try:
                 self._font_cache[font_size] = ImageFont.truetype(self.config.FONT_PATH, font_size)
             except Exception:
                 self._font_cache[font_size] = ImageFont.load_default()
-        font = self._font_cache[font_size]
-        draw.text(position, text, font=font, fill=color[::-1])
-        return _rgb_to_bgr(np.array(pil_image))
+        return self._font_cache[font_size]
+
+    def _sprite(self, text, font_size, color):
+        key = (text, font_size, tuple(int(c) for c in color))
+        sprite = self._sprite_cache.get(key)
+        if sprite is None:
+            if len(self._sprite_cache) >= SPRITE_CACHE_SIZE:
+                self._sprite_cache.popitem(last=False)
+            sprite = self._sprite_cache[key] = _TextSprite(self._font(font_size), text, key[2])
+        else:
+            self._sprite_cache.move_to_end(key)
+        return sprite
+
+    def put_text_unicode(self, frame, text, position, color, font_size):
+        """Draws text into ``frame`` in place (BGR color) and returns it."""
+        return self._sprite(text, font_size, color).draw(frame, position)
 
     def center_text(self, frame, text, font_size, color, region_height=None):
-        if font_size not in self._font_cache:
-            try:
-                self._font_cache[font_size] = ImageFont.truetype(self.config.FONT_PATH, font_size)
-            except Exception:
-                self._font_cache[font_size] = ImageFont.load_default()
-        font = self._font_cache[font_size]
-        temp_image = Image.new('RGB', (frame.shape[1], frame.shape[0]))
-        draw = ImageDraw.Draw(temp_image)
-        text_bbox = draw.textbbox((0, 0), text, font=font)
-        text_width = text_bbox[2] - text_bbox[0]
-        text_height = text_bbox[3] - text_bbox[1]
-        text_x = (frame.shape[1] - text_width) // 2
+        sprite = self._sprite(text, font_size, color)
+        text_x = (frame.shape[1] - sprite.width) // 2
         if region_height is None:
-            text_y = (frame.shape[0] - text_height) // 2
+            text_y = (frame.shape[0] - sprite.height) // 2
         else:
-            text_y = (region_height - text_height) // 2
-        return self.put_text_unicode(frame, text, (text_x, text_y), color, font_size)
+            text_y = (region_height - sprite.height) // 2
+        return sprite.draw(frame, (text_x, text_y))
 
     def render_drowsiness_alert(self, frame, duration=None):
-        overlay = frame.copy()
-        alpha = 0.4 + 0.2 * np.sin(time.time() * 8)
-        cv2.rectangle(overlay, (0, 0), (frame.shape[1], frame.shape[0]), self.config.ALERT_COLOR, -1)
-        _add_weighted(overlay, alpha, frame, 1 - alpha, 0, frame)
+        self._drowsiness_tint.set_alpha(0.4 + 0.2 * np.sin(time.time() * 8)).apply(frame)
         return self.center_text(frame, "CẢNH BÁO NGỦ GẬT!", font_size=40, color=self.config.ALERT_COLOR)
 
     def render_distraction_alert(self, frame):
-        overlay = frame.copy()
-        cv2.rectangle(overlay, (0, 0), (frame.shape[1], frame.shape[0]), self.config.SECONDARY_COLOR, -1)
-        _add_weighted(overlay, 0.3, frame, 0.7, 0, frame)
+        self._distraction_tint.apply(frame)
         return self.center_text(frame, "KHÔNG PHÁT HIỆN TÀI XẾ!", font_size=30, color=self.config.ALERT_COLOR)
 
     def render_head_tilt_alert(self, frame):
-        overlay = frame.copy()
-        alpha = 0.4 + 0.2 * np.sin(time.time() * 6)
-        cv2.rectangle(overlay, (0, 0), (frame.shape[1], frame.shape[0]), (0, 165, 255), -1)
-        _add_weighted(overlay, alpha, frame, 1 - alpha, 0, frame)
+        self._head_tilt_tint.set_alpha(0.4 + 0.2 * np.sin(time.time() * 6)).apply(frame)
         return self.center_text(frame, "CẢNH BÁO TƯ THẾ ĐẦU!", font_size=35, color=(255, 255, 255))
 
     def render_fatigue_alert(self, frame):
-        overlay = frame.copy()
-        cv2.rectangle(overlay, (0, 0), (frame.shape[1], 50), (0, 0, 255), -1)
-        _add_weighted(overlay, 0.7, frame, 0.3, 0, frame)
-        return self.center_text(frame, "Bạn đang có dấu hiệu buồn ngủ!", font_size=24, color=(255, 255, 255), region_height=50)
+        self._fatigue_tint.apply(frame, bottom=FATIGUE_BANNER_HEIGHT)
+        return self.center_text(frame, "Bạn đang có dấu hiệu buồn ngủ!", font_size=24, color=(255, 255, 255),
+                                region_height=FATIGUE_BANNER_HEIGHT)
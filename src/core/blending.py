@@ -0,0 +1,49 @@
+import numpy as np
+
+WEIGHT_BITS = 8
+WEIGHT_ONE = 1 << WEIGHT_BITS
+
+
+def blend_weight(alpha):
+    """Opacity in [0, 1] as an 8-bit fixed-point weight in [0, 256]."""
+    return min(max(int(round(alpha * WEIGHT_ONE)), 0), WEIGHT_ONE)
+
+
+class SolidTint:
+    """Blends a solid BGR color over a frame region in place.
+
+    dst = (dst * (256 - w) + color * w + 128) >> 8, computed in uint16 (at most 255 * 256 + 128),
+    so no overlay frame and no float copies are needed. ``color * w + 128`` is precomputed per
+    opacity and the uint16 scratch buffer is reused while the region shape stays the same.
+    """
+
+    def __init__(self, color, alpha=0.5):
+        self.color = np.array(color, dtype=np.uint16)
+        self.weight = None
+        self._scratch = None
+        self.set_alpha(alpha)
+
+    def set_alpha(self, alpha):
+        weight = blend_weight(alpha)
+        if weight != self.weight:
+            self.weight = weight
+            self._inv_weight = WEIGHT_ONE - weight
+            self._term = self.color * weight + (WEIGHT_ONE >> 1)
+        return self
+
+    def apply(self, frame, top=0, bottom=None, left=0, right=None):
+        """Tint ``frame[top:bottom, left:right]`` (e.g. a banner) in place; returns the frame."""
+        roi = frame[top:bottom, left:right]
+        if roi.size == 0 or self.weight == 0:
+            return frame
+        if self.weight == WEIGHT_ONE:
+            roi[:] = self.color
+            return frame
+        if self._scratch is None or self._scratch.shape != roi.shape:
+            self._scratch = np.empty(roi.shape, dtype=np.uint16)
+        scratch = self._scratch
+        np.multiply(roi, self._inv_weight, out=scratch, dtype=np.uint16)
+        scratch += self._term
+        scratch >>= WEIGHT_BITS
+        roi[:] = scratch
+        return frame
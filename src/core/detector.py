@@ -4,14 +4,22 @@ import numpy as np
 import time
 import logging
 import os
+import re
+import threading
 from collections import deque
 from src.configs.config import Config
-from src.core.model_manager import ModelManager
+from src.core.model_registry import ModelRegistry
 from src.core.facial_analyzer import FacialAnalyzer
 from src.core.alert_system import AlertSystem
+from src.core.face_tracker import FaceTracker
+from src.core.frame_pipeline import LatestFrameQueue
+from src.core.frame_source import CameraSource
+from src.core.profiler import StageProfiler
 
 logger = logging.getLogger(__name__)
 
+CALIBRATION_MODELS = ("hog", "landmarks")
+
 
 def manual_bgr_to_gray(bgr):
     b = bgr[:, :, 0].astype(np.float64)
@@ -86,27 +94,242 @@ def non_max_suppression(boxes, scores, iou_threshold=0.4):
 
 
 class PipelineStage:
-    def __init__(self, output_dir="pipeline_output"):
+    """Writes intermediate pipeline images from a background thread.
+
+    ``save_stage`` only enqueues; a bounded drop-oldest queue keeps a slow disk from
+    ever stalling detection. Codecs: ``png`` (fast compression level), ``jpg``,
+    ``npy`` (raw array per stage) and ``npz`` (one archive per frame).
+    """
+
+    _EXTENSIONS = {"png": "png", "jpg": "jpg", "npy": "npy", "npz": "npz"}
+
+    def __init__(self, output_dir="pipeline_output", codec=None, queue_size=None):
+        config = Config()
         self.output_dir = output_dir
+        self.codec = codec or config.PIPELINE_CODEC
+        if self.codec not in self._EXTENSIONS:
+            raise ValueError(f"Unsupported pipeline codec: {self.codec}")
+        self.png_compression = config.PIPELINE_PNG_COMPRESSION
+        self.jpeg_quality = config.PIPELINE_JPEG_QUALITY
         self.frame_count = 0
         os.makedirs(output_dir, exist_ok=True)
+        # Frame ids continue after the files of earlier runs instead of overwriting them
+        self.frame_base = self._next_free_id()
+        self._queue = LatestFrameQueue(queue_size or config.PIPELINE_QUEUE_SIZE)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._npz_frame = None
+        self._npz_items = {}
+        self.written = 0
+
+    @property
+    def dropped(self):
+        return self._queue.dropped
+
+    def _next_free_id(self):
+        ids = [int(m.group(1)) for m in
+               (re.match(r"frame(\d+)", f) for f in os.listdir(self.output_dir)) if m]
+        return max(ids) + 1 if ids else 0
+
+    def _path(self, fid, name=None):
+        stem = f"frame{fid:06d}" if name is None else f"frame{fid:06d}_{name}"
+        return os.path.join(self.output_dir, f"{stem}.{self._EXTENSIONS[self.codec]}")
 
     def save_stage(self, name, image, frame_id=None):
         if frame_id is not None:
             self.frame_count = frame_id
-        filename = f"frame{self.frame_count:04d}_{name}.png"
-        filepath = os.path.join(self.output_dir, filename)
-        cv2.imwrite(filepath, image)
-        return filepath
+        fid = self.frame_base + self.frame_count
+        self._ensure_writer()
+        self._queue.put((fid, name, image))
+        return self._path(fid) if self.codec == "npz" else self._path(fid, name)
+
+    def _ensure_writer(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._queue.reopen()
+                self._thread = threading.Thread(target=self._writer_loop, name="pipeline-writer", daemon=True)
+                self._thread.start()
+
+    def _writer_loop(self):
+        while True:
+            item = self._queue.get(timeout=0.5)
+            if item is None:
+                if self._queue.closed:
+                    break
+                continue
+            try:
+                self._write(*item)
+            except Exception as e:
+                logger.error(f"Failed to write pipeline stage {item[1]}: {e}")
+            finally:
+                self._queue.task_done()
+        self._flush_npz()
+
+    def _write(self, fid, name, image):
+        if self.codec == "png":
+            cv2.imwrite(self._path(fid, name), image, [cv2.IMWRITE_PNG_COMPRESSION, self.png_compression])
+        elif self.codec == "jpg":
+            cv2.imwrite(self._path(fid, name), image, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+        elif self.codec == "npy":
+            np.save(self._path(fid, name), image)
+        else:
+            if self._npz_frame is not None and fid != self._npz_frame:
+                self._flush_npz()
+            self._npz_frame = fid
+            self._npz_items[name] = image
+            return
+        self.written += 1
+
+    def _flush_npz(self):
+        if self._npz_frame is None:
+            return
+        try:
+            np.savez(self._path(self._npz_frame), **self._npz_items)
+            self.written += len(self._npz_items)
+        except Exception as e:
+            logger.error(f"Failed to write pipeline frame {self._npz_frame}: {e}")
+        self._npz_frame = None
+        self._npz_items = {}
+
+    def flush(self, timeout=5.0):
+        # Items stay unfinished from put() until the writer has written them, so no gap between
+        # dequeue and write can make this return early
+        return self._queue.join(timeout)
+
+    def close(self, timeout=5.0):
+        self.flush(timeout)
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        self._queue.close()
+        if thread is not None:
+            thread.join(timeout)
+        if self.dropped:
+            logger.warning(f"Pipeline writer dropped {self.dropped} stage images (queue full)")
+
+
+class StageSink:
+    """Fan-out point for intermediate pipeline images.
+
+    Stages are passed as zero-argument builders and only rendered when at least one
+    consumer is attached, so visualizations cost nothing in production.
+    """
+
+    def __init__(self):
+        self._consumers = []
+        self.frame_id = -1
+
+    @property
+    def active(self):
+        return bool(self._consumers)
+
+    def attach(self, consumer):
+        if consumer not in self._consumers:
+            self._consumers.append(consumer)
+
+    def detach(self, consumer):
+        if consumer in self._consumers:
+            self._consumers.remove(consumer)
+
+    def begin_frame(self):
+        self.frame_id += 1
+
+    def emit(self, name, build):
+        if not self._consumers:
+            return
+        image = build()
+        for consumer in self._consumers:
+            consumer(self.frame_id, name, image)
+
+
+def combine_edge_maps(edges_left, edges_right):
+    h_l, w_l = edges_left.shape
+    h_r, w_r = edges_right.shape
+    combined = np.zeros((max(h_l, h_r), w_l + w_r), dtype=np.uint8)
+    combined[:h_l, :w_l] = edges_left
+    combined[:h_r, w_l:w_l + w_r] = edges_right
+    return combined
+
+
+def ssd_face_boxes(rows, width, height, confidence_threshold, nms_threshold):
+    """Face boxes of one image from SSD DetectionOutput rows (image_id, label, conf, x1, y1, x2, y2)."""
+    boxes = []
+    scores = []
+    scale = np.array([width, height, width, height])
+    for row in rows:
+        confidence = float(row[2])
+        if confidence > confidence_threshold:
+            x1, y1, x2, y2 = (row[3:7] * scale).astype(int)
+            x1 = max(0, x1)
+            y1 = max(0, y1)
+            x2 = min(width, x2)
+            y2 = min(height, y2)
+            if (x2 - x1) >= 30 and (y2 - y1) >= 30:
+                boxes.append([x1, y1, x2, y2])
+                scores.append(confidence)
+    if boxes:
+        boxes, scores = non_max_suppression(boxes, scores, nms_threshold)
+    if boxes:
+        boxes = [[int(x) for x in b] for b in boxes]
+        scores = [float(s) for s in scores]
+    return boxes, scores
+
+
+def detect_faces_dnn_batch(net, frames, confidence_threshold, nms_threshold):
+    """Run the SSD face detector once over a batch of frames; returns (boxes, scores) per frame.
+
+    All frames go through a single blobFromImages/forward call and the detections are routed
+    back to their frame by the image id column of the DetectionOutput layer.
+    """
+    blob = cv2.dnn.blobFromImages(
+        [cv2.resize(frame, (300, 300)) for frame in frames], 1.0, (300, 300), (104.0, 177.0, 123.0)
+    )
+    net.setInput(blob)
+    detections = net.forward()[0, 0]
+    image_ids = detections[:, 0].astype(int)
+    results = []
+    for index, frame in enumerate(frames):
+        h, w = frame.shape[:2]
+        results.append(ssd_face_boxes(detections[image_ids == index], w, h,
+                                      confidence_threshold, nms_threshold))
+    return results
+
+
+def shape_to_array(shape, out=None, offset=None):
+    """Copy the points of a dlib full_object_detection into an (N, 2) int32 array, reusing ``out``."""
+    parts = shape.parts()
+    if out is None or len(out) != len(parts):
+        out = np.empty((len(parts), 2), dtype=np.int32)
+    out.reshape(-1)[:] = [c for p in parts for c in (p.x, p.y)]
+    if offset is not None:
+        out += offset
+    return out
+
+
+def _draw_face_boxes(frame, face_boxes):
+    vis = frame.copy()
+    for fb in face_boxes:
+        cv2.rectangle(vis, (int(fb[0]), int(fb[1])), (int(fb[2]), int(fb[3])), (0, 255, 0), 2)
+    return vis
+
+
+def _draw_rois(frame, regions):
+    vis = frame.copy()
+    for pts in regions:
+        cv2.polylines(vis, [pts], True, (0, 255, 0), 1)
+    return vis
 
 
 class DrowsinessDetector:
-    def __init__(self, save_pipeline=False):
+    def __init__(self, save_pipeline=False, face_detectors=None, models=None):
+        started = time.perf_counter()
         self.config = Config()
-        self.model_manager = ModelManager()
+        self.models = models or ModelRegistry.shared()
+        self.model_manager = self.models.model_manager
         self.analyzer = FacialAnalyzer()
         self.alert_system = AlertSystem()
-        self.camera = None
+        self.source = None
+        self._now = time.time()
         self.ear_threshold = self.config.EAR_THRESHOLD
         self.ear_consec_frames = self.config.EAR_CONSEC_FRAMES
         self.blink_consec_frames = self.config.BLINK_CONSEC_FRAMES
@@ -115,10 +338,6 @@ class DrowsinessDetector:
         self.no_face_counter = 0
         self.face_detected = False
         self.drowsiness_start_time = None
-        self.face_cascade = self._init_face_cascade()
-        self.face_net_dnn = self._init_face_detector_dnn()
-        self.face_cnn_detector = self._init_face_detector_cnn()
-        self.landmark_predictor = self.model_manager.predictor
         self.head_tilt_threshold = self.config.HEAD_TILT_THRESHOLD
         self.head_tilt_frames = self.config.HEAD_TILT_FRAMES
         self.head_tilt_counter = 0
@@ -138,84 +357,100 @@ class DrowsinessDetector:
         self.blink_times = deque(maxlen=100)
         self.fatigue_alert = False
         self.fatigue_start_time = None
-        self.last_reset_time = time.time()
+        self.last_reset_time = None
         self.calibration_ear_values = []
         self.fatigue_alert_count = 0
         self.notification_duration = self.config.NOTIFICATION_DURATION
+        self.stage_sink = StageSink()
+        self.profiler = StageProfiler(window=self.config.PROFILE_WINDOW, enabled=self.config.PROFILING)
+        self.face_source = None
+        self.face_score = 0.0
+        self._dnn_faces = None
+        # Landmarks of the current frame; overwritten in place by the next one
+        self._landmarks = np.empty((68, 2), dtype=np.int32)
+        self.face_detectors = tuple(face_detectors or self.config.FACE_DETECTORS)
+        unknown = set(self.face_detectors) - {"dnn", "hog", "cnn", "haar"}
+        if unknown:
+            raise ValueError(f"Unknown face detectors: {sorted(unknown)}")
+        self.render_overlays = True
+        self.pipeline = None
+        self._save_pipeline = False
         self.save_pipeline = save_pipeline
-        self.pipeline = PipelineStage() if save_pipeline else None
         self._last_canny_left = None
         self._last_canny_right = None
+        self.tracker = FaceTracker(
+            keyframe_interval=self.config.TRACKING_KEYFRAME_INTERVAL,
+            min_overlap=self.config.TRACKING_MIN_OVERLAP,
+            margin=self.config.TRACKING_BOX_MARGIN,
+        ) if self.config.FACE_TRACKING else None
+        # Models load on first use; warm-up starts them now so the first frames rarely wait
+        self.block_on_models = True
+        self.required_models = tuple(self.face_detectors) + ("landmarks",)
+        if self.config.MODEL_WARMUP:
+            self.models.warm_up(self.required_models)
+        logger.info(f"DrowsinessDetector ready in {(time.perf_counter() - started) * 1000:.1f} ms "
+                    f"(models: {', '.join(self.required_models)})")
+
+    @property
+    def face_cascade(self):
+        return self.models.face_cascade
+
+    @property
+    def face_net_dnn(self):
+        return self.models.face_net_dnn
+
+    @property
+    def face_cnn_detector(self):
+        return self.models.face_cnn_detector
+
+    @property
+    def landmark_predictor(self):
+        return self.models.landmark_predictor
+
+    @property
+    def save_pipeline(self):
+        return self._save_pipeline
+
+    @save_pipeline.setter
+    def save_pipeline(self, enabled):
+        enabled = bool(enabled)
+        if enabled == self._save_pipeline:
+            return
+        if enabled:
+            if self.pipeline is None:
+                self.pipeline = PipelineStage()
+            self.stage_sink.attach(self._save_stage)
+        else:
+            self.stage_sink.detach(self._save_stage)
+        self._save_pipeline = enabled
 
-    def _init_face_cascade(self):
-        cascade_path = cv2.data.haarcascades + "haarcascade_frontalface_default.xml"
-        if not os.path.exists(cascade_path):
-            logger.error(f"Haar cascade not found at {cascade_path}")
-            return None
-        logger.info("Initialized Haar cascade face detector")
-        return cv2.CascadeClassifier(cascade_path)
-
-    def _init_face_detector_dnn(self):
-        proto = self.config.DNN_PROTOTXT
-        model = self.config.DNN_CAFFEMODEL
-        if not os.path.exists(proto) or not os.path.exists(model):
-            logger.warning("DNN model files not found, downloading...")
-            self.model_manager.download_dnn_models()
-        try:
-            net = cv2.dnn.readNetFromCaffe(proto, model)
-            logger.info("Initialized OpenCV DNN face detector (SSD)")
-            return net
-        except Exception as e:
-            logger.error(f"DNN face detector init failed: {e}")
-            return None
+    def _save_stage(self, frame_id, name, image):
+        self.pipeline.save_stage(name, image, frame_id=frame_id)
 
     def detect_faces_dnn(self, frame):
-        if self.face_net_dnn is None:
+        if self._dnn_faces is not None:
+            # Already computed for this frame by a batched forward pass (MultiStreamDetector)
+            faces, self._dnn_faces = self._dnn_faces, None
+            return faces
+        net = self.face_net_dnn
+        if net is None:
             return [], []
-        h, w = frame.shape[:2]
-        blob = cv2.dnn.blobFromImage(
-            cv2.resize(frame, (300, 300)), 1.0, (300, 300), (104.0, 177.0, 123.0)
-        )
-        self.face_net_dnn.setInput(blob)
-        detections = self.face_net_dnn.forward()
-        boxes = []
-        scores = []
-        for i in range(detections.shape[2]):
-            confidence = float(detections[0, 0, i, 2])
-            if confidence > self.config.DNN_CONFIDENCE_THRESHOLD:
-                box = detections[0, 0, i, 3:7] * np.array([w, h, w, h])
-                x1, y1, x2, y2 = box.astype(int)
-                x1 = max(0, x1)
-                y1 = max(0, y1)
-                x2 = min(w, x2)
-                y2 = min(h, y2)
-                if (x2 - x1) >= 30 and (y2 - y1) >= 30:
-                    boxes.append([x1, y1, x2, y2])
-                    scores.append(confidence)
-        if boxes:
-            boxes, scores = non_max_suppression(boxes, scores, self.config.DNN_NMS_THRESHOLD)
-        if boxes:
-            boxes = [[int(x) for x in b] for b in boxes]
-            scores = [float(s) for s in scores]
-        return boxes, scores
-
-    def _init_face_detector_cnn(self):
-        model_path = self.config.CNN_FACE_MODEL
-        if not os.path.exists(model_path):
-            logger.warning("CNN face model not found, downloading...")
-            self.model_manager.download_cnn_face_model()
-        try:
-            cnn_detector = dlib.cnn_face_detection_model_v1(model_path)
-            logger.info("Initialized dlib CNN face detector (MMOD)")
-            return cnn_detector
-        except Exception as e:
-            logger.error(f"CNN face detector init failed: {e}")
-            return None
+        with self.models.lock("dnn"):
+            return detect_faces_dnn_batch(net, [frame], self.config.DNN_CONFIDENCE_THRESHOLD,
+                                          self.config.DNN_NMS_THRESHOLD)[0]
+
+    def wants_dnn(self):
+        """Whether the next analyze_frame would run the SSD detector (no tracker prediction to reuse)."""
+        if "dnn" not in self.face_detectors or self.face_net_dnn is None:
+            return False
+        return self.tracker is None or self.tracker.needs_detection()
 
     def detect_faces_cnn(self, gray):
-        if self.face_cnn_detector is None:
+        cnn_detector = self.face_cnn_detector
+        if cnn_detector is None:
             return []
-        faces = self.face_cnn_detector(gray, 1)
+        with self.models.lock("cnn"):
+            faces = cnn_detector(gray, 1)
         boxes = []
         for f in faces:
             r = f.rect
@@ -223,49 +458,72 @@ class DrowsinessDetector:
         return boxes
 
     def detect_faces_haar(self, gray):
-        if self.face_cascade is None:
+        cascade = self.face_cascade
+        if cascade is None:
             return []
-        faces = self.face_cascade.detectMultiScale(
-            gray, scaleFactor=1.1, minNeighbors=5, minSize=(80, 80)
-        )
+        with self.models.lock("haar"):
+            faces = cascade.detectMultiScale(
+                gray, scaleFactor=1.1, minNeighbors=5, minSize=(80, 80)
+            )
         boxes = []
         for (x, y, w, h) in faces:
             boxes.append([int(x), int(y), int(x + w), int(y + h)])
         return boxes
 
     def detect_faces_dlib(self, gray):
-        return self.model_manager.detector(gray)
+        detector = self.models.hog_detector
+        if detector is None:
+            return []
+        with self.models.lock("hog"):
+            return detector(gray)
+
+    def set_source(self, source):
+        """Switch to another FrameSource. Its clock may differ from the previous one, so timed state is reset."""
+        if self.source is not None and self.source is not source:
+            self.stop_camera()
+        self.source = source
+        self.reset_state()
+
+    def reset_state(self):
+        """Forget everything learned from the current stream; thresholds and calibration are kept."""
+        self.eye_counter = 0
+        self.no_face_counter = 0
+        self.face_detected = False
+        self.head_tilt_counter = 0
+        self.blink_total = 0
+        self.yawn_counter = 0
+        self.yawn_total = 0
+        self.mouth_open = False
+        self.eye_closed = False
+        self.ear_history.clear()
+        self.blink_times.clear()
+        self.yawn_times.clear()
+        self.drowsiness_start_time = None
+        self.fatigue_start_time = None
+        self.fatigue_alert_count = 0
+        self.last_reset_time = None
+        if self.tracker is not None:
+            self.tracker.reset()
 
     def start_camera(self):
-        logger.info("Initializing camera...")
-        if self.camera and self.camera.isOpened():
+        if self.source is None:
+            self.source = CameraSource(self.config.CAMERA_ID, self.config.CAMERA_WIDTH,
+                                       self.config.CAMERA_HEIGHT, self.config.CAMERA_FPS)
+        if self.source.isOpened():
             return
-        backends = [cv2.CAP_ANY, cv2.CAP_DSHOW, cv2.CAP_MSMF]
-        for index in [self.config.CAMERA_ID, 1]:
-            for backend in backends:
-                try:
-                    self.camera = cv2.VideoCapture(index, backend)
-                    if self.camera.isOpened():
-                        break
-                    self.camera.release()
-                    self.camera = None
-                except Exception:
-                    self.camera = None
-            if self.camera and self.camera.isOpened():
-                break
-        if not self.camera or not self.camera.isOpened():
-            raise IOError("Cannot open camera")
-        self.camera.set(cv2.CAP_PROP_FRAME_WIDTH, self.config.CAMERA_WIDTH)
-        self.camera.set(cv2.CAP_PROP_FRAME_HEIGHT, self.config.CAMERA_HEIGHT)
-        self.camera.set(cv2.CAP_PROP_FPS, self.config.CAMERA_FPS)
-        logger.info("Camera initialized successfully")
+        logger.info(f"Opening frame source {type(self.source).__name__}...")
+        self.source.open()
+        logger.info("Frame source opened successfully")
 
     def stop_camera(self):
-        if self.camera and self.camera.isOpened():
-            self.camera.release()
+        if self.source is not None and self.source.isOpened():
+            self.source.release()
             self.analyzer.reset_display()
-            self.camera = None
-            logger.info("Camera stopped")
+            if self.tracker is not None:
+                self.tracker.reset()
+            if self.pipeline is not None:
+                self.pipeline.close()
+            logger.info("Frame source stopped")
 
     def detect_blink(self, ear):
         self.ear_history.append(ear)
@@ -278,14 +536,14 @@ class DrowsinessDetector:
             return False
         elif self.eye_closed and ear >= dynamic_threshold:
             self.eye_closed = False
-            current_time = time.time()
+            current_time = self._now
             self.blink_total += 1
             self.blink_times.append(current_time)
             return True
         return False
 
     def detect_yawn(self, mar):
-        current_time = time.time()
+        current_time = self._now
         if mar > self.yawn_threshold and not self.mouth_open:
             self.yawn_counter += 1
             if self.yawn_counter >= self.yawn_consec_frames:
@@ -305,18 +563,20 @@ class DrowsinessDetector:
         return False
 
     def check_yawn_frequency(self):
-        current_time = time.time()
+        current_time = self._now
         recent_yawns = [t for t in self.yawn_times if current_time - t <= 60]
         return len(recent_yawns) >= self.yawn_per_minute_threshold
 
     def check_blink_frequency(self):
-        current_time = time.time()
+        current_time = self._now
         recent_blinks = [t for t in self.blink_times if current_time - t <= 60]
         return len(recent_blinks) >= self.blink_per_minute_threshold
 
     def reset_counters_if_needed(self):
-        current_time = time.time()
-        if current_time - self.last_reset_time >= 60:
+        current_time = self._now
+        if self.last_reset_time is None:
+            self.last_reset_time = current_time
+        elif current_time - self.last_reset_time >= 60:
             self.blink_times.clear()
             self.yawn_times.clear()
             self.blink_total = 0
@@ -324,83 +584,197 @@ class DrowsinessDetector:
             self.fatigue_alert_count = 0
             self.last_reset_time = current_time
 
-    def process_frame(self):
-        self.reset_counters_if_needed()
-        if not self.camera or not self.camera.isOpened():
+    def _run_face_detector(self, name, frame, gray_eq):
+        if name == "dnn":
+            return self.detect_faces_dnn(frame)
+        if name == "hog":
+            faces = self.detect_faces_dlib(gray_eq)
+            return [[f.left(), f.top(), f.right(), f.bottom()] for f in faces], [0.9] * len(faces)
+        if name == "cnn":
+            boxes = self.detect_faces_cnn(gray_eq)
+            return boxes, [0.9] * len(boxes)
+        boxes = self.detect_faces_haar(gray_eq)
+        return boxes, [0.5] * len(boxes)
+
+    def _detect_faces(self, frame, gray, gray_eq=None):
+        """Run the configured detector chain (FACE_DETECTORS) and return the first non-empty result."""
+        profiler = self.profiler
+        for name in self.face_detectors:
+            if name != "dnn" and gray_eq is None:
+                with profiler.span("clahe"):
+                    gray_eq = self.analyzer.apply_clahe(gray)
             try:
-                self.start_camera()
+                with profiler.span(f"detect_{name}"):
+                    face_boxes, face_scores = self._run_face_detector(name, frame, gray_eq)
             except Exception as e:
-                logger.error(f"Failed to reinitialize camera: {e}")
-                return None, False, self._empty_metrics()
+                logger.warning(f"{name} face detection failed: {e}")
+                continue
+            if face_boxes:
+                self.face_source = name
+                return face_boxes, face_scores
+        self.face_source = None
+        return [], []
 
-        ret, frame = self.camera.read()
-        if not ret or frame is None:
-            return None, False, self._empty_metrics()
+    def _face_crop(self, gray, face_box):
+        h, w = gray.shape[:2]
+        x1, y1, x2, y2 = [int(v) for v in face_box]
+        pad = self.config.ROI_PADDING
+        step = self.config.ROI_SIZE_STEP
+        # Snap the crop size to a coarse grid so the cached CLAHE engines get reused
+        crop_w = min(w, max(step, -(-int((x2 - x1) * (1 + 2 * pad)) // step) * step))
+        crop_h = min(h, max(step, -(-int((y2 - y1) * (1 + 2 * pad)) // step) * step))
+        cx = (x1 + x2) // 2
+        cy = (y1 + y2) // 2
+        ox = min(max(0, cx - crop_w // 2), w - crop_w)
+        oy = min(max(0, cy - crop_h // 2), h - crop_h)
+        crop = gray[oy:oy + crop_h, ox:ox + crop_w]
+        return self.analyzer.apply_clahe(crop), (ox, oy)
+
+    def _locate_face(self, frame, gray):
+        """Detector chain + tracker + landmark model shared by analyze_frame and extract_landmarks.
+
+        Returns (face_boxes, shape_np, landmark_image, offset); shape_np is None when no face
+        (or no usable face box) was found.
+        """
+        profiler = self.profiler
+        stages = self.stage_sink
+        roi_mode = self.config.ROI_PREPROCESSING
+        gray_eq = None
+        if not roi_mode:
+            with profiler.span("clahe"):
+                gray_eq = self.analyzer.apply_clahe(gray)
+            stages.emit("02_clahe", lambda: cv2.cvtColor(gray_eq, cv2.COLOR_GRAY2BGR))
+
+        if self.tracker is not None and not self.tracker.needs_detection():
+            face_boxes = [self.tracker.predict(frame.shape)]
+            face_scores = [self.tracker.confidence]
+            self.face_source = "tracker"
+        else:
+            face_boxes, face_scores = self._detect_faces(frame, gray, gray_eq)
+            if self.tracker is not None:
+                if face_boxes:
+                    self.tracker.seed(face_boxes[0])
+                else:
+                    self.tracker.reset()
+
+        self.face_score = float(face_scores[0]) if face_boxes else 0.0
+        if not face_boxes:
+            stages.emit("03_face_detection", frame.copy)
+            return face_boxes, None, None, None
+        stages.emit("03_face_detection", lambda: _draw_face_boxes(frame, face_boxes))
 
+        face_box = face_boxes[0]
+        if roi_mode:
+            # Equalize only the padded face crop and run the landmark model inside it
+            with profiler.span("clahe"):
+                landmark_image, (ox, oy) = self._face_crop(gray, face_box)
+            stages.emit("02_clahe", lambda: cv2.cvtColor(landmark_image, cv2.COLOR_GRAY2BGR))
+        else:
+            landmark_image, (ox, oy) = gray_eq, (0, 0)
+        offset = np.array([ox, oy], dtype=np.int32)
+
+        dlib_face = dlib.rectangle(int(face_box[0]) - ox, int(face_box[1]) - oy,
+                                   int(face_box[2]) - ox, int(face_box[3]) - oy)
+        predictor = self.landmark_predictor
+        if not dlib_face or predictor is None:
+            return face_boxes, None, landmark_image, offset
+
+        with profiler.span("landmarks"):
+            shape = predictor(landmark_image, dlib_face)
+            shape_np = self._landmarks = shape_to_array(shape, self._landmarks, offset)
+        if self.tracker is not None:
+            with profiler.span("tracker"):
+                self.tracker.update(shape_np, frame.shape)
+        return face_boxes, shape_np, landmark_image, offset
+
+    def extract_landmarks(self, frame):
+        """Face box, detector score and 68 landmarks through the production face path.
+
+        No temporal logic or rendering runs; returns (None, 0.0, None) when no face is found.
+        """
         frame = cv2.resize(frame, (self.config.CAMERA_WIDTH, self.config.CAMERA_HEIGHT))
         gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        face_boxes, shape_np, _, _ = self._locate_face(frame, gray)
+        if shape_np is None:
+            return None, 0.0, None
+        return face_boxes[0], self.face_score, shape_np
 
-        stage_images = {}
-
-        gray_eq = self.analyzer.apply_clahe(gray)
-        stage_images["01_grayscale"] = cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR)
-        stage_images["02_clahe"] = cv2.cvtColor(gray_eq, cv2.COLOR_GRAY2BGR)
+    def read_frame(self):
+        if self.source is None or not self.source.isOpened():
+            try:
+                self.start_camera()
+            except Exception as e:
+                logger.error(f"Failed to reinitialize frame source: {e}")
+                return None, None
 
-        face_boxes = []
-        face_scores = []
+        ok, frame, timestamp = self.source.read()
+        if not ok or frame is None:
+            return None, None
+        return frame, timestamp
 
+    def process_frame(self):
+        start = time.perf_counter_ns()
+        frame, timestamp = self.read_frame()
+        self.profiler.record("capture", time.perf_counter_ns() - start)
+        if frame is None:
+            if self.source is None or self.source.realtime:
+                self._now = time.time()
+                self.reset_counters_if_needed()
+            return None, False, self._empty_metrics()
+        return self.analyze_frame(frame, timestamp)
+
+    def analyze_frame(self, frame, timestamp=None, dnn_faces=None):
+        """Analyze one frame; ``dnn_faces`` are SSD (boxes, scores) precomputed for it, in camera resolution."""
+        self._now = time.time() if timestamp is None else timestamp
+        if not self.block_on_models and not self.models.ready(self.required_models):
+            # Show the live picture while the models are still warming up instead of a blank screen
+            frame = cv2.resize(frame, (self.config.CAMERA_WIDTH, self.config.CAMERA_HEIGHT))
+            metrics = self._empty_metrics()
+            metrics.update({'detector': None, 'timings': {}, 'models_ready': False})
+            return frame, False, metrics
+        self._dnn_faces = dnn_faces
+        profiler = self.profiler
+        profiler.begin_frame()
         try:
-            dnn_boxes, dnn_scores = self.detect_faces_dnn(frame)
-            if dnn_boxes:
-                face_boxes = dnn_boxes
-                face_scores = dnn_scores
-        except Exception as e:
-            logger.warning(f"DNN face detection failed: {e}")
+            with profiler.span("total"):
+                frame, alert, metrics = self._analyze_frame(frame)
+        finally:
+            self._dnn_faces = None
+        profiler.count(f"detector_{self.face_source or 'none'}")
+        metrics['detector'] = self.face_source
+        metrics['timings'] = profiler.end_frame()
+        return frame, alert, metrics
+
+    def _analyze_frame(self, frame):
+        profiler = self.profiler
+        self.reset_counters_if_needed()
+        with profiler.span("resize"):
+            frame = cv2.resize(frame, (self.config.CAMERA_WIDTH, self.config.CAMERA_HEIGHT))
+        with profiler.span("grayscale"):
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
 
-        if not face_boxes:
-            try:
-                faces_dlib = self.detect_faces_dlib(gray_eq)
-                if faces_dlib:
-                    face_boxes = [[f.left(), f.top(), f.right(), f.bottom()] for f in faces_dlib]
-                    face_scores = [0.9] * len(faces_dlib)
-            except Exception as e:
-                logger.warning(f"dlib face detection failed: {e}")
+        stages = self.stage_sink
+        if stages.active:
+            stages.begin_frame()
 
-        if not face_boxes:
-            try:
-                faces_haar = self.detect_faces_haar(gray_eq)
-                if faces_haar:
-                    face_boxes = faces_haar
-                    face_scores = [0.5] * len(faces_haar)
-            except Exception as e:
-                logger.warning(f"Haar face detection failed: {e}")
+        stages.emit("01_grayscale", lambda: cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR))
+        face_boxes, shape_np, landmark_image, offset = self._locate_face(frame, gray)
 
         if not face_boxes:
             self.no_face_counter += 1
             self.face_detected = False
-            stage_images["03_face_detection"] = frame.copy()
-            if self.no_face_counter >= self.no_face_alert_frames:
-                frame = self.alert_system.render_distraction_alert(frame)
-                if self.save_pipeline:
-                    for name, img in stage_images.items():
-                        self.pipeline.save_stage(name, img)
-                return frame, True, self._empty_metrics()
-            stage_images["03_face_detection"] = frame.copy()
-            frame = self.alert_system.put_text_unicode(frame, "Không phát hiện khuôn mặt", (20, 30), self.config.ALERT_COLOR, font_size=24)
-            if self.save_pipeline:
-                for name, img in stage_images.items():
-                    self.pipeline.save_stage(name, img)
-            return frame, False, self._empty_metrics()
+            distracted = self.no_face_counter >= self.no_face_alert_frames
+            if self.render_overlays:
+                with profiler.span("render"):
+                    if distracted:
+                        frame = self.alert_system.render_distraction_alert(frame)
+                    else:
+                        frame = self.alert_system.put_text_unicode(frame, "Không phát hiện khuôn mặt", (20, 30), self.config.ALERT_COLOR, font_size=24)
+            return frame, distracted, self._empty_metrics()
 
         self.no_face_counter = 0
         self.face_detected = True
 
-        face_box = face_boxes[0]
-        face_vis = frame.copy()
-        for fb in face_boxes:
-            cv2.rectangle(face_vis, (fb[0], fb[1]), (fb[2], fb[3]), (0, 255, 0), 2)
-        stage_images["03_face_detection"] = face_vis
-
         drowsiness_detected = False
         head_tilt_detected = False
         fatigue_detected = False
@@ -410,96 +784,83 @@ class DrowsinessDetector:
         pitch_angle = 0.0
         pitch_ratio = 0.0
 
-        dlib_face = dlib.rectangle(int(face_box[0]), int(face_box[1]), int(face_box[2]), int(face_box[3]))
-
-        if dlib_face:
-            shape = self.landmark_predictor(gray_eq, dlib_face)
-            shape_np = np.array([[p.x, p.y] for p in shape.parts()])
-
+        if shape_np is not None:
             left_eye = shape_np[36:42]
             right_eye = shape_np[42:48]
             mouth = shape_np[48:68]
 
-            left_ear = self.analyzer.calculate_ear(left_eye)
-            right_ear = self.analyzer.calculate_ear(right_eye)
-            ear = (left_ear + right_ear) / 2.0
-            mar = self.analyzer.calculate_mar(mouth)
-            roll_angle, pitch_angle, pitch_ratio = self.analyzer.calculate_head_pose(shape_np)
+            with profiler.span("ratios"):
+                ear, mar, roll_angle, pitch_angle, pitch_ratio = self.analyzer.calculate_ratios(shape_np)
 
             if self.reference_roll is None:
                 self.reference_roll = roll_angle
                 self.reference_pitch = pitch_angle
 
-            edges_left = self.analyzer.apply_canny_on_eye(gray_eq, left_eye, 50, 150)
-            edges_right = self.analyzer.apply_canny_on_eye(gray_eq, right_eye, 50, 150)
-            self._last_canny_left = edges_left
-            self._last_canny_right = edges_right
-
-            iris_area_left = self.analyzer.detect_iris_by_contour(edges_left)
-            iris_area_right = self.analyzer.detect_iris_by_contour(edges_right)
-
-            roi_vis = frame.copy()
-            cv2.polylines(roi_vis, [left_eye], True, (0, 255, 0), 1)
-            cv2.polylines(roi_vis, [right_eye], True, (0, 255, 0), 1)
-            cv2.polylines(roi_vis, [mouth], True, (0, 255, 0), 1)
-            stage_images["04_landmarks_roi"] = roi_vis
-
-            if edges_left.size > 0 and edges_right.size > 0:
-                h_l, w_l = edges_left.shape
-                h_r, w_r = edges_right.shape
-                max_h = max(h_l, h_r)
-                combined_w = w_l + w_r
-                canny_vis = np.zeros((max_h, combined_w), dtype=np.uint8)
-                canny_vis[:h_l, :w_l] = edges_left
-                canny_vis[:h_r, w_l:w_l + w_r] = edges_right
-                stage_images["05_canny_edges"] = cv2.cvtColor(canny_vis, cv2.COLOR_GRAY2BGR)
-
-            self.detect_blink(ear)
-            self.detect_yawn(mar)
-            blink_frequent = self.check_blink_frequency()
-            yawn_frequent = self.check_yawn_frequency()
-            fatigue_detected = blink_frequent or yawn_frequent
-
-            delta_roll = abs(roll_angle - self.reference_roll) if self.reference_roll is not None else 0
-            delta_pitch = abs(pitch_angle - self.reference_pitch) if self.reference_pitch is not None else 0
-            head_tilted = delta_roll > self.head_tilt_threshold or delta_pitch > self.head_tilt_threshold
-            if head_tilted:
-                self.head_tilt_counter += 1
-                if self.head_tilt_counter >= self.head_tilt_frames:
-                    head_tilt_detected = True
-            else:
-                self.head_tilt_counter = max(0, self.head_tilt_counter - 1)
+            # The eye edge maps only feed the displays, so headless runs skip them
+            if self.render_overlays or stages.active:
+                with profiler.span("canny"):
+                    edges_left = self.analyzer.apply_canny_on_eye(landmark_image, left_eye - offset, 50, 150)
+                    edges_right = self.analyzer.apply_canny_on_eye(landmark_image, right_eye - offset, 50, 150)
+                self._last_canny_left = edges_left
+                self._last_canny_right = edges_right
+
+                with profiler.span("iris"):
+                    iris_area_left = self.analyzer.detect_iris_by_contour(edges_left)
+                    iris_area_right = self.analyzer.detect_iris_by_contour(edges_right)
+
+                stages.emit("04_landmarks_roi", lambda: _draw_rois(frame, [left_eye, right_eye, mouth]))
+                if edges_left.size > 0 and edges_right.size > 0:
+                    stages.emit("05_canny_edges", lambda: cv2.cvtColor(
+                        combine_edge_maps(edges_left, edges_right), cv2.COLOR_GRAY2BGR))
+
+            with profiler.span("temporal"):
+                self.detect_blink(ear)
+                self.detect_yawn(mar)
+                blink_frequent = self.check_blink_frequency()
+                yawn_frequent = self.check_yawn_frequency()
+                fatigue_detected = blink_frequent or yawn_frequent
+
+                delta_roll = abs(roll_angle - self.reference_roll) if self.reference_roll is not None else 0
+                delta_pitch = abs(pitch_angle - self.reference_pitch) if self.reference_pitch is not None else 0
+                head_tilted = delta_roll > self.head_tilt_threshold or delta_pitch > self.head_tilt_threshold
+                if head_tilted:
+                    self.head_tilt_counter += 1
+                    if self.head_tilt_counter >= self.head_tilt_frames:
+                        head_tilt_detected = True
+                else:
+                    self.head_tilt_counter = max(0, self.head_tilt_counter - 1)
 
             if ear < self.ear_threshold:
                 self.eye_counter += 1
                 if self.eye_counter == 1:
-                    self.drowsiness_start_time = time.time()
+                    self.drowsiness_start_time = self._now
                 if self.eye_counter >= self.ear_consec_frames:
                     drowsiness_detected = True
-                    drowsiness_duration = time.time() - self.drowsiness_start_time
-                    frame = self.alert_system.render_drowsiness_alert(frame, drowsiness_duration)
             else:
                 self.eye_counter = 0
                 self.drowsiness_start_time = None
 
-            if head_tilt_detected:
-                frame = self.alert_system.render_head_tilt_alert(frame)
-            if fatigue_detected and self.fatigue_alert_count < 1:
+            show_fatigue = fatigue_detected and self.fatigue_alert_count < 1
+            if show_fatigue:
                 if self.fatigue_start_time is None:
-                    self.fatigue_start_time = time.time()
-                frame = self.alert_system.render_fatigue_alert(frame)
-                if time.time() - self.fatigue_start_time >= self.notification_duration:
+                    self.fatigue_start_time = self._now
+                if self._now - self.fatigue_start_time >= self.notification_duration:
                     self.fatigue_alert_count += 1
                     self.fatigue_start_time = None
 
-            self.draw_facial_ratios(frame, shape_np)
+            if self.render_overlays:
+                with profiler.span("render"):
+                    if drowsiness_detected:
+                        drowsiness_duration = self._now - self.drowsiness_start_time
+                        frame = self.alert_system.render_drowsiness_alert(frame, drowsiness_duration)
+                    if head_tilt_detected:
+                        frame = self.alert_system.render_head_tilt_alert(frame)
+                    if show_fatigue:
+                        frame = self.alert_system.render_fatigue_alert(frame)
 
-        stage_images["06_result"] = frame
+                    self.draw_facial_ratios(frame, shape_np)
 
-        if self.save_pipeline:
-            fid = int(time.time() * 1000) % 100000
-            for name, img in stage_images.items():
-                self.pipeline.save_stage(name, img, frame_id=fid)
+        stages.emit("06_result", frame.copy)
 
         metrics = {
             'ear': ear,
@@ -535,26 +896,29 @@ class DrowsinessDetector:
     def reset_head_reference(self):
         self.reference_roll = None
         self.reference_pitch = None
+        if self.tracker is not None:
+            self.tracker.reset()
 
     def process_calibration_frame(self):
-        if not self.camera or not self.camera.isOpened():
+        if self.source is None or not self.source.isOpened():
             return None, 0.0
-        ret, frame = self.camera.read()
-        if not ret or frame is None:
+        ok, frame, _ = self.source.read()
+        if not ok or frame is None:
             return None, 0.0
         frame = cv2.resize(frame, (self.config.CAMERA_WIDTH, self.config.CAMERA_HEIGHT))
+        if not self.block_on_models and not self.models.ready(CALIBRATION_MODELS):
+            # Still loading: hand back the frame without an EAR instead of blocking the caller
+            self.models.warm_up(CALIBRATION_MODELS)
+            return frame, None
         gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
         gray_eq = self.analyzer.apply_clahe(gray)
         faces = self.detect_faces_dlib(gray_eq)
         ear = 0.0
-        if faces:
-            shape = self.landmark_predictor(gray_eq, faces[0])
-            shape_np = np.array([[p.x, p.y] for p in shape.parts()])
-            left_eye = shape_np[36:42]
-            right_eye = shape_np[42:48]
-            left_ear = self.analyzer.calculate_ear(left_eye)
-            right_ear = self.analyzer.calculate_ear(right_eye)
-            ear = (left_ear + right_ear) / 2.0
+        predictor = self.landmark_predictor
+        if faces and predictor is not None:
+            shape = predictor(gray_eq, faces[0])
+            shape_np = self._landmarks = shape_to_array(shape, self._landmarks)
+            ear = self.analyzer.calculate_ratios(shape_np)[0]
             self.calibration_ear_values.append(ear)
             self.draw_facial_ratios(frame, shape_np)
         return frame, ear
@@ -0,0 +1,86 @@
+import numpy as np
+
+
+def _box_overlap(a, b):
+    ix1 = max(a[0], b[0])
+    iy1 = max(a[1], b[1])
+    ix2 = min(a[2], b[2])
+    iy2 = min(a[3], b[3])
+    inter = max(0, ix2 - ix1) * max(0, iy2 - iy1)
+    area_a = max(0, a[2] - a[0]) * max(0, a[3] - a[1])
+    area_b = max(0, b[2] - b[0]) * max(0, b[3] - b[1])
+    smaller = min(area_a, area_b)
+    return inter / smaller if smaller > 0 else 0.0
+
+
+def landmarks_to_box(shape_np, frame_shape, margin=0.1):
+    xs = shape_np[:, 0]
+    ys = shape_np[:, 1]
+    x1, x2 = int(xs.min()), int(xs.max())
+    y1, y2 = int(ys.min()), int(ys.max())
+    mx = int((x2 - x1) * margin)
+    my = int((y2 - y1) * margin)
+    h, w = frame_shape[:2]
+    return [max(0, x1 - mx), max(0, y1 - my), min(w, x2 + mx), min(h, y2 + my)]
+
+
+class FaceTracker:
+    """Keeps the driver's face box alive between detector keyframes.
+
+    The box for the next frame is predicted from the previous frame's 68 landmarks
+    (plus their frame-to-frame motion), so the full-frame detectors only need to run
+    every ``keyframe_interval`` frames or when the landmark boxes stop agreeing.
+    """
+
+    def __init__(self, keyframe_interval=10, min_overlap=0.6, margin=0.1):
+        self.keyframe_interval = keyframe_interval
+        self.min_overlap = min_overlap
+        self.margin = margin
+        self.reset()
+
+    def reset(self):
+        self.box = None
+        self.confidence = 0.0
+        self.frames_since_keyframe = 0
+        self._landmark_box = None
+        self._velocity = (0, 0)
+
+    @property
+    def is_tracking(self):
+        return self.box is not None
+
+    def needs_detection(self):
+        return self.box is None or self.frames_since_keyframe >= self.keyframe_interval
+
+    def predict(self, frame_shape):
+        self.frames_since_keyframe += 1
+        vx, vy = self._velocity
+        h, w = frame_shape[:2]
+        x1, y1, x2, y2 = self.box
+        return [max(0, x1 + vx), max(0, y1 + vy), min(w, x2 + vx), min(h, y2 + vy)]
+
+    def seed(self, detected_box):
+        self.frames_since_keyframe = 0
+        if self.box is not None and _box_overlap(self.box, detected_box) >= self.min_overlap:
+            return
+        self.box = [int(v) for v in detected_box]
+        self.confidence = 1.0
+        self._landmark_box = None
+        self._velocity = (0, 0)
+
+    def update(self, shape_np, frame_shape):
+        new_box = landmarks_to_box(shape_np, frame_shape, self.margin)
+        if new_box[2] - new_box[0] < 30 or new_box[3] - new_box[1] < 30:
+            self.reset()
+            return False
+        if self._landmark_box is not None:
+            self.confidence = _box_overlap(self._landmark_box, new_box)
+            if self.confidence < self.min_overlap:
+                self.reset()
+                return False
+            prev_c = np.add(self._landmark_box[:2], self._landmark_box[2:]) // 2
+            new_c = np.add(new_box[:2], new_box[2:]) // 2
+            self._velocity = (int(new_c[0] - prev_c[0]), int(new_c[1] - prev_c[1]))
+        self._landmark_box = new_box
+        self.box = new_box
+        return True
@@ -1,6 +1,9 @@
 import numpy as np
 import logging
+import threading
+from collections import OrderedDict
 from math import atan2, degrees
+from src.configs.config import Config
 
 logger = logging.getLogger(__name__)
 
@@ -10,6 +13,58 @@ def euclidean_distance(a, b):
     return np.sqrt(np.sum(diff * diff))
 
 
+# Landmark pairs for every distance the facial ratios need: left eye (A, B, C), right eye (A, B, C),
+# inner mouth (A, B, C, D) and the nose bridge; all are measured with one gather
+_RATIO_PAIRS = np.array([
+    (37, 41), (38, 40), (36, 39),
+    (43, 47), (44, 46), (42, 45),
+    (61, 67), (62, 66), (63, 65), (60, 64),
+    (27, 30),
+], dtype=np.intp)
+
+RATIO_DTYPE = np.dtype([
+    ('ear', np.float64), ('left_ear', np.float64), ('right_ear', np.float64), ('mar', np.float64),
+    ('roll_angle', np.float64), ('pitch_angle', np.float64), ('pitch_ratio', np.float64),
+])
+
+
+def compute_ratios(landmarks, min_ear=0.15, max_ear=0.40):
+    """EAR, MAR and head pose for one (68, 2) landmark array or an (N, 68, 2) batch.
+
+    Returns a RATIO_DTYPE record, or an (N,) record array for a batch. Each eye's EAR is
+    clipped to [min_ear, max_ear] before averaging; degenerate widths give 0.
+    """
+    shape = np.asarray(landmarks, dtype=np.float64)
+    single = shape.ndim == 2
+    shape = shape.reshape(-1, 68, 2)
+    n = len(shape)
+    delta = shape[:, _RATIO_PAIRS[:, 0]] - shape[:, _RATIO_PAIRS[:, 1]]
+    dist = np.sqrt(np.einsum('nij,nij->ni', delta, delta))
+
+    eyes = dist[:, :6].reshape(n, 2, 3)
+    widths = eyes[:, :, 2]
+    eye_ratios = np.divide(eyes[:, :, 0] + eyes[:, :, 1], 2.0 * widths, out=np.zeros((n, 2)), where=widths > 0)
+    np.clip(eye_ratios, min_ear, max_ear, out=eye_ratios)
+    mar = np.divide(dist[:, 6] + dist[:, 7] + dist[:, 8], 3.0 * dist[:, 9], out=np.zeros(n),
+                    where=dist[:, 9] > 0)
+
+    eye_centers = shape[:, 36:48].reshape(n, 2, 6, 2).sum(axis=2) / 6.0
+    eye_vector = eye_centers[:, 1] - eye_centers[:, 0]
+    face_vector = (eye_centers[:, 0] + eye_centers[:, 1]) / 2.0 - (shape[:, 48] + shape[:, 54]) / 2.0
+    face_height = np.sqrt(np.einsum('ni,ni->n', face_vector, face_vector))
+    pitch_ratio = np.divide(dist[:, 10], face_height, out=np.zeros(n), where=face_height > 0)
+
+    result = np.empty(n, dtype=RATIO_DTYPE)
+    result['ear'] = (eye_ratios[:, 0] + eye_ratios[:, 1]) / 2.0
+    result['left_ear'] = eye_ratios[:, 0]
+    result['right_ear'] = eye_ratios[:, 1]
+    result['mar'] = mar
+    result['roll_angle'] = np.degrees(np.arctan2(eye_vector[:, 1], eye_vector[:, 0]))
+    result['pitch_angle'] = (pitch_ratio - 0.35) * 180
+    result['pitch_ratio'] = pitch_ratio
+    return result[0] if single else result
+
+
 def _gaussian_kernel(sigma):
     r = int(np.ceil(3 * sigma))
     axis = np.arange(-r, r + 1, dtype=np.float64)
@@ -121,48 +176,200 @@ def manual_canny(gray, sigma=0.8, low=None, high=None):
     return edges
 
 
+def _gaussian_kernel_1d(sigma, dtype=np.float32):
+    r = int(np.ceil(3 * sigma))
+    axis = np.arange(-r, r + 1, dtype=np.float64)
+    kernel = np.exp(-(axis ** 2) / (2 * sigma ** 2))
+    return (kernel / kernel.sum()).astype(dtype)
+
+
+_SOBEL_SMOOTH = np.array([1, 2, 1], dtype=np.float32)
+_SOBEL_DIFF = np.array([-1, 0, 1], dtype=np.float32)
+
+
+def _separable_filter(image, k_col, k_row):
+    rV, rH = len(k_col) // 2, len(k_row) // 2
+    padded = np.pad(image.astype(k_row.dtype, copy=False), ((rV, rV), (rH, rH)), mode='reflect')
+    H, W = image.shape
+    tmp = k_col[0] * padded[0:H]
+    for i in range(1, len(k_col)):
+        if k_col[i] != 0:
+            tmp += k_col[i] * padded[i:i + H]
+    out = k_row[0] * tmp[:, 0:W]
+    for j in range(1, len(k_row)):
+        if k_row[j] != 0:
+            out += k_row[j] * tmp[:, j:j + W]
+    return out
+
+
+def _compute_gradient_vectorized(gray, sigma, exact):
+    if exact:
+        # Same float64 arithmetic as the reference path, so the edge map stays bit-identical
+        smoothed = _convolve2d(gray, _gaussian_kernel(sigma))
+        Gx = _convolve2d(smoothed, _SOBEL_X)
+        Gy = _convolve2d(smoothed, _SOBEL_Y)
+    else:
+        g = _gaussian_kernel_1d(sigma, np.float32)
+        smoothed = _separable_filter(gray, g, g)
+        Gx = _separable_filter(smoothed, _SOBEL_SMOOTH, _SOBEL_DIFF)
+        Gy = _separable_filter(smoothed, _SOBEL_DIFF, _SOBEL_SMOOTH)
+    M = np.hypot(Gx, Gy)
+    theta = np.degrees(np.arctan2(Gy, Gx)) % 180
+    return M, theta
+
+
+def _non_max_suppression_vectorized(M, theta):
+    H, W = M.shape
+    padded = np.pad(M, 1, mode='edge')
+    center = padded[1:H + 1, 1:W + 1]
+    # Neighbour pairs along the gradient: 0 deg, 45 deg, 90 deg, 135 deg
+    pairs = (
+        (padded[1:H + 1, 2:W + 2], padded[1:H + 1, 0:W]),
+        (padded[0:H, 2:W + 2], padded[2:H + 2, 0:W]),
+        (padded[0:H, 1:W + 1], padded[2:H + 2, 1:W + 1]),
+        (padded[0:H, 0:W], padded[2:H + 2, 2:W + 2]),
+    )
+    direction = ((theta >= 22.5).astype(np.int8) + (theta >= 67.5) + (theta >= 112.5)) % 4
+    direction[theta >= 157.5] = 0
+    keep = np.zeros((H, W), dtype=bool)
+    for d, (n1, n2) in enumerate(pairs):
+        keep |= (direction == d) & (center >= n1) & (center >= n2)
+    return np.where(keep, M, 0).astype(M.dtype, copy=False)
+
+
+def _dilate3x3(mask):
+    H, W = mask.shape
+    padded = np.pad(mask, 1)
+    rows = padded[:, 0:W] | padded[:, 1:W + 1] | padded[:, 2:W + 2]
+    return rows[0:H] | rows[1:H + 1] | rows[2:H + 2]
+
+
+def _hysteresis_vectorized(nms_map, low, high):
+    candidates = nms_map >= low
+    result = nms_map >= high
+    count = int(result.sum())
+    while True:
+        result = _dilate3x3(result) & candidates
+        new_count = int(result.sum())
+        if new_count == count:
+            break
+        count = new_count
+    return result.astype(np.uint8) * 255
+
+
+def vectorized_canny(gray, sigma=0.8, low=None, high=None, exact=True):
+    M, theta = _compute_gradient_vectorized(gray, sigma, exact)
+    nms = _non_max_suppression_vectorized(M, theta)
+    if low is None or high is None:
+        high, low = _otsu_threshold(nms)
+    return _hysteresis_vectorized(nms, low, high)
+
+
+class ClaheEngine:
+    """CLAHE for a fixed (shape, tile grid, clip limit).
+
+    Tile lookup indices and bilinear weights depend only on the frame geometry, so they
+    are computed once here and every call only builds the tile histograms (one bincount)
+    and blends the four tile mappings into preallocated float32 buffers.
+    """
+
+    def __init__(self, shape, clip_limit=2.0, tile_grid_size=(8, 8), dtype=np.float32):
+        h, w = shape
+        gy, gx = tile_grid_size
+        self.shape = (h, w)
+        self.clip_limit = clip_limit
+        self.tile_grid_size = (gy, gx)
+        self.dtype = dtype
+        self.bins = 256
+        t_h = h // gy
+        t_w = w // gx
+        self._crop = (gy * t_h, gx * t_w)
+        self._tile_pixels = t_h * t_w
+
+        tile_rows = np.repeat(np.arange(gy, dtype=np.intp), t_h)
+        tile_cols = np.repeat(np.arange(gx, dtype=np.intp), t_w)
+        self._hist_base = (tile_rows[:, np.newaxis] * gx + tile_cols[np.newaxis, :]) * self.bins
+
+        ti_f = np.clip((np.arange(h, dtype=np.float64) + 0.5) / t_h - 0.5, 0, gy - 1)
+        tj_f = np.clip((np.arange(w, dtype=np.float64) + 0.5) / t_w - 0.5, 0, gx - 1)
+        ti0 = np.floor(ti_f).astype(np.intp)
+        ti1 = np.minimum(ti0 + 1, gy - 1)
+        tj0 = np.floor(tj_f).astype(np.intp)
+        tj1 = np.minimum(tj0 + 1, gx - 1)
+        dy = ti_f - ti0
+        dx = tj_f - tj0
+        self._dy = dy.astype(dtype)[:, np.newaxis]
+        self._dx = dx.astype(dtype)[np.newaxis, :]
+        self._dy_inv = (1 - dy).astype(dtype)[:, np.newaxis]
+        self._dx_inv = (1 - dx).astype(dtype)[np.newaxis, :]
+        self._bases = [
+            (r[:, np.newaxis] * gx + c[np.newaxis, :]) * self.bins
+            for r, c in ((ti0, tj0), (ti0, tj1), (ti1, tj0), (ti1, tj1))
+        ]
+
+        self._hist_idx = np.empty(self._crop, dtype=np.intp)
+        self._idx = np.empty(self.shape, dtype=np.intp)
+        self._values = [np.empty(self.shape, dtype=dtype) for _ in range(4)]
+
+    def _mappings(self, gray):
+        gy, gx = self.tile_grid_size
+        n_tiles = gy * gx
+        np.add(self._hist_base, gray[:self._crop[0], :self._crop[1]], out=self._hist_idx)
+        hist = np.bincount(self._hist_idx.ravel(), minlength=n_tiles * self.bins)
+        hist = hist.reshape(n_tiles, self.bins).astype(np.float64)
+        clip_val = self.clip_limit * (self._tile_pixels / self.bins) if self.clip_limit > 0 else 0
+        if clip_val > 0:
+            excess = np.maximum(hist - clip_val, 0).sum(axis=1, keepdims=True)
+            hist = np.minimum(hist, clip_val) + excess / self.bins
+        cdf = hist.cumsum(axis=1)
+        return (cdf / cdf[:, -1:] * 255.0).astype(self.dtype).ravel()
+
+    def apply(self, gray):
+        if gray.dtype != np.uint8:
+            gray = np.clip(np.round(gray), 0, self.bins - 1).astype(np.uint8)
+        lut = self._mappings(gray)
+        for base, values in zip(self._bases, self._values):
+            np.add(base, gray, out=self._idx)
+            np.take(lut, self._idx, out=values)
+        v00, v01, v10, v11 = self._values
+        v00 *= self._dx_inv
+        v01 *= self._dx
+        v00 += v01
+        v00 *= self._dy_inv
+        v10 *= self._dx_inv
+        v11 *= self._dx
+        v10 += v11
+        v10 *= self._dy
+        v00 += v10
+        np.round(v00, out=v00)
+        np.clip(v00, 0, 255, out=v00)
+        return v00.astype(np.uint8)
+
+
+_clahe_cache = threading.local()
+_CLAHE_CACHE_SIZE = 8
+
+
+def get_clahe_engine(shape, clip_limit=2.0, tile_grid_size=(8, 8)):
+    # Engines own scratch buffers, so each thread keeps its own small LRU of them
+    engines = getattr(_clahe_cache, "engines", None)
+    if engines is None:
+        engines = _clahe_cache.engines = OrderedDict()
+    key = (tuple(shape), tuple(tile_grid_size), float(clip_limit))
+    engine = engines.get(key)
+    if engine is None:
+        engine = ClaheEngine(shape, clip_limit, tile_grid_size)
+        engines[key] = engine
+        if len(engines) > _CLAHE_CACHE_SIZE:
+            engines.popitem(last=False)
+    else:
+        engines.move_to_end(key)
+    return engine
+
+
 def _clahe(gray, clip_limit=2.0, tile_grid_size=(8, 8)):
-    gray = np.asarray(gray, dtype=np.float64)
-    h, w = gray.shape
-    t_h = h // tile_grid_size[0]
-    t_w = w // tile_grid_size[1]
-    bins = 256
-
-    mappings = np.zeros((tile_grid_size[0], tile_grid_size[1], bins), dtype=np.float64)
-    for ti in range(tile_grid_size[0]):
-        for tj in range(tile_grid_size[1]):
-            y0, y1 = ti * t_h, (ti + 1) * t_h
-            x0, x1 = tj * t_w, (tj + 1) * t_w
-            tile = gray[y0:y1, x0:x1].ravel().astype(np.intp)
-            hist = np.bincount(tile, minlength=bins).astype(np.float64)
-            clip_val = clip_limit * (tile.size / bins) if clip_limit > 0 else 0
-            if clip_val > 0:
-                excess = np.sum(np.maximum(hist - clip_val, 0))
-                hist = np.minimum(hist, clip_val)
-                hist += excess / bins
-            cdf = hist.cumsum()
-            cdf = cdf / cdf[-1] * 255.0
-            mappings[ti, tj] = cdf
-
-    ti_f = (np.arange(h, dtype=np.float64) + 0.5) / t_h - 0.5
-    tj_f = (np.arange(w, dtype=np.float64) + 0.5) / t_w - 0.5
-    ti_f = np.clip(ti_f, 0, tile_grid_size[0] - 1)
-    tj_f = np.clip(tj_f, 0, tile_grid_size[1] - 1)
-    ti0 = np.floor(ti_f).astype(np.intp)
-    ti1 = np.minimum(ti0 + 1, tile_grid_size[0] - 1).astype(np.intp)
-    tj0 = np.floor(tj_f).astype(np.intp)
-    tj1 = np.minimum(tj0 + 1, tile_grid_size[1] - 1).astype(np.intp)
-    dy = (ti_f - ti0)[:, np.newaxis]
-    dx = (tj_f - tj0)[np.newaxis, :]
-    idx = np.clip(np.round(gray), 0, bins - 1).astype(np.intp)
-
-    shape = (h, w)
-    v00 = mappings[ti0[:, np.newaxis], tj0[np.newaxis, :], idx]
-    v10 = mappings[ti1[:, np.newaxis], tj0[np.newaxis, :], idx]
-    v01 = mappings[ti0[:, np.newaxis], tj1[np.newaxis, :], idx]
-    v11 = mappings[ti1[:, np.newaxis], tj1[np.newaxis, :], idx]
-    result = (v00 * (1 - dx) + v01 * dx) * (1 - dy) + (v10 * (1 - dx) + v11 * dx) * dy
-    return np.clip(np.round(result), 0, 255).astype(np.uint8)
+    gray = np.asarray(gray)
+    return get_clahe_engine(gray.shape, clip_limit, tile_grid_size).apply(gray)
 
 
 def _bounding_rect(pts):
@@ -175,73 +382,94 @@ def _bounding_rect(pts):
     return x, y, w, h
 
 
-def _largest_blob_area(binary):
-    labeled, _ = _label_components(binary)
-    if labeled is None:
-        return 0
-    labels = labeled[labeled > 0]
-    if len(labels) == 0:
+def _find_runs(binary):
+    h, w = binary.shape
+    padded = np.zeros((h, w + 2), dtype=np.int8)
+    padded[:, 1:w + 1] = binary
+    d = np.diff(padded, axis=1)
+    rows, starts = np.nonzero(d == 1)
+    _, ends = np.nonzero(d == -1)
+    return rows, starts, ends
+
+
+def _resolve_parents(parent, a, b):
+    # Array-backed union-find: hook both roots of every edge to the smaller one,
+    # then compress paths with pointer jumping until every edge shares a root.
+    while True:
+        while True:
+            grand = parent[parent]
+            if np.array_equal(grand, parent):
+                break
+            parent = grand
+        ra = parent[a]
+        rb = parent[b]
+        diff = ra != rb
+        if not diff.any():
+            return parent
+        ra, rb = ra[diff], rb[diff]
+        low = np.minimum(ra, rb)
+        np.minimum.at(parent, ra, low)
+        np.minimum.at(parent, rb, low)
+
+
+def _run_components(binary, connectivity=4):
+    rows, starts, ends = _find_runs(binary)
+    n_runs = len(rows)
+    if n_runs == 0:
+        return rows, starts, ends, np.zeros(0, dtype=np.intp)
+
+    # Runs come out in raster order, so runs of row r+1 can be matched against
+    # runs of row r with one searchsorted per run instead of a per-pixel scan.
+    reach = 1 if connectivity == 8 else 0
+    row_first = np.searchsorted(rows, np.arange(binary.shape[0] + 1))
+    nxt = rows + 1
+    lo = row_first[np.minimum(nxt, binary.shape[0])]
+    hi = row_first[np.minimum(nxt + 1, binary.shape[0])]
+    hi = np.where(nxt < binary.shape[0], hi, lo)
+    # First candidate in the next row whose end reaches this run's start
+    key = (nxt.astype(np.int64) << 32) + starts - reach
+    order_key = (rows.astype(np.int64) << 32) + ends
+    first = np.maximum(np.searchsorted(order_key, key, side='right'), lo)
+    # Last candidate in the next row whose start is within this run's end
+    key_end = (nxt.astype(np.int64) << 32) + ends + reach
+    start_key = (rows.astype(np.int64) << 32) + starts
+    last = np.minimum(np.searchsorted(start_key, key_end, side='left'), hi)
+    counts = np.maximum(last - first, 0)
+    a = np.repeat(np.arange(n_runs), counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    b = np.repeat(first, counts) + offsets
+
+    parent = _resolve_parents(np.arange(n_runs), a, b)
+    return rows, starts, ends, parent
+
+
+def _largest_blob_area(binary, connectivity=4):
+    binary = np.asarray(binary) > 0
+    _, starts, ends, roots = _run_components(binary, connectivity)
+    if len(roots) == 0:
         return 0
-    counts = np.bincount(labels)
-    return int(counts.max())
+    areas = np.bincount(roots, weights=ends - starts)
+    return int(areas.max())
 
 
-def _label_components(binary):
-    binary = (binary > 0).astype(np.uint8)
-    h, w = binary.shape
-    labeled = np.zeros((h, w), dtype=np.int32)
-    current_label = 1
-    equivalences = {}
-
-    def find(x):
-        while equivalences.get(x, x) != x:
-            equivalences[x] = equivalences[equivalences[x]]
-            x = equivalences[x]
-        return x
-
-    def union(a, b):
-        ra, rb = find(a), find(b)
-        if ra != rb:
-            equivalences[ra] = rb
-
-    for i in range(h):
-        for j in range(w):
-            if binary[i, j] == 0:
-                continue
-            neighbors = []
-            if i > 0 and labeled[i - 1, j] > 0:
-                neighbors.append(labeled[i - 1, j])
-            if j > 0 and labeled[i, j - 1] > 0:
-                neighbors.append(labeled[i, j - 1])
-            if not neighbors:
-                labeled[i, j] = current_label
-                equivalences[current_label] = current_label
-                current_label += 1
-            else:
-                labeled[i, j] = min(neighbors)
-                for n in neighbors:
-                    union(labeled[i, j], n)
-
-    for i in range(h):
-        for j in range(w):
-            if labeled[i, j] > 0:
-                labeled[i, j] = find(labeled[i, j])
-
-    unique = np.unique(labeled[labeled > 0])
-    if len(unique) == 0:
+def _label_components(binary, connectivity=4):
+    binary = np.asarray(binary) > 0
+    rows, starts, ends, roots = _run_components(binary, connectivity)
+    if len(roots) == 0:
         return None, None
-    mapping = {old: new + 1 for new, old in enumerate(unique)}
-    remapped = np.zeros_like(labeled)
-    for i in range(h):
-        for j in range(w):
-            if labeled[i, j] > 0:
-                remapped[i, j] = mapping[labeled[i, j]]
-
-    return remapped, len(unique)
+    # Roots are the first run of each component, so labels follow raster order
+    unique_roots, run_labels = np.unique(roots, return_inverse=True)
+    run_labels = (run_labels + 1).astype(np.int32)
+    labeled = np.zeros(binary.shape, dtype=np.int32)
+    lengths = ends - starts
+    cols = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths) + np.repeat(starts, lengths)
+    labeled[np.repeat(rows, lengths), cols] = np.repeat(run_labels, lengths)
+    return labeled, len(unique_roots)
 
 
 class FacialAnalyzer:
     def __init__(self):
+        self.config = Config()
         self.min_ear = 0.15
         self.max_ear = 0.40
 
@@ -256,6 +484,12 @@ class FacialAnalyzer:
         ear = (A + B) / (2.0 * C) if C > 0 else 0.0
         return np.clip(ear, self.min_ear, self.max_ear)
 
+    def calculate_ratios(self, shape_np):
+        """EAR, MAR, roll, pitch and pitch ratio of one (68, 2) landmark array."""
+        ear, _, _, mar, roll_angle, pitch_angle, pitch_ratio = compute_ratios(
+            shape_np, self.min_ear, self.max_ear).item()
+        return ear, mar, roll_angle, pitch_angle, pitch_ratio
+
     def calculate_mar(self, mouth_points):
         A = euclidean_distance(mouth_points[13], mouth_points[19])
         B = euclidean_distance(mouth_points[14], mouth_points[18])
@@ -276,7 +510,10 @@ class FacialAnalyzer:
         roi = self.extract_eye_roi(gray, eye_points)
         if roi.size == 0:
             return np.zeros((10, 10), dtype=np.uint8)
-        edges = manual_canny(roi, sigma=0.8, low=low, high=high)
+        if self.config.CANNY_BACKEND == "vectorized":
+            edges = vectorized_canny(roi, sigma=0.8, low=low, high=high, exact=self.config.CANNY_EXACT)
+        else:
+            edges = manual_canny(roi, sigma=0.8, low=low, high=high)
         return edges
 
     def detect_iris_by_contour(self, eye_edges):
@@ -309,5 +546,9 @@ class FacialAnalyzer:
 
     def reset_display(self):
         import cv2
-        cv2.destroyAllWindows()
+        try:
+            cv2.destroyAllWindows()
+        except cv2.error:
+            # Headless OpenCV builds (offline sources, batch runs) have no highgui
+            pass
         logger.info("Reset hiển thị")
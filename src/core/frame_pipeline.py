@@ -0,0 +1,173 @@
+import threading
+import time
+import logging
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class LatestFrameQueue:
+    """Bounded queue where a new item evicts the oldest one instead of blocking the producer.
+
+    With ``drop_oldest=False`` it is a plain bounded queue: ``put`` waits for room (or close).
+    Like queue.Queue, consumers that call ``task_done()`` for each item let ``join()`` wait until
+    every item put so far has been handled (evicted items count as handled).
+    """
+
+    def __init__(self, maxsize=1, drop_oldest=True):
+        self._items = deque(maxlen=max(1, maxsize))
+        self._cond = threading.Condition()
+        self._closed = False
+        self.drop_oldest = drop_oldest
+        self.dropped = 0
+        self._unfinished = 0
+
+    def __len__(self):
+        with self._cond:
+            return len(self._items)
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def put(self, item):
+        with self._cond:
+            if not self.drop_oldest:
+                while len(self._items) == self._items.maxlen and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return False
+            elif len(self._items) == self._items.maxlen:
+                self.dropped += 1
+                self._unfinished -= 1
+            self._items.append(item)
+            self._unfinished += 1
+            self._cond.notify_all()
+            return True
+
+    def get(self, timeout=None):
+        with self._cond:
+            if not self._items and not self._closed:
+                self._cond.wait(timeout)
+            if not self._items:
+                return None
+            item = self._items.popleft()
+            self._cond.notify_all()
+            return item
+
+    def task_done(self):
+        with self._cond:
+            self._unfinished -= 1
+            self._cond.notify_all()
+
+    def join(self, timeout=None):
+        """Wait until every item has been handled; returns False on timeout."""
+        with self._cond:
+            return self._cond.wait_for(lambda: self._unfinished <= 0, timeout)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def reopen(self):
+        with self._cond:
+            self._closed = False
+            self._items.clear()
+            self._unfinished = 0
+
+
+class ThreadedDetector:
+    """Runs camera capture and frame analysis of a DrowsinessDetector on background threads.
+
+    The capture thread only reads frames, the worker thread only analyses the newest one,
+    and the caller (UI thread) polls ``latest()`` for finished results without blocking.
+    Recorded sources (``source.realtime == False``) are replayed without dropping: both queues
+    apply backpressure instead, and the end-of-source result only follows the last analysed frame.
+    """
+
+    def __init__(self, detector, queue_size=None):
+        self.detector = detector
+        self.queue_size = queue_size if queue_size is not None else detector.config.FRAME_QUEUE_SIZE
+        self.lossless = False
+        self._frames = LatestFrameQueue(self.queue_size)
+        self._results = LatestFrameQueue(1)
+        self._running = threading.Event()
+        self._capture_thread = None
+        self._worker_thread = None
+        self.frames_captured = 0
+        self.frames_processed = 0
+
+    @property
+    def is_running(self):
+        return self._running.is_set()
+
+    @property
+    def frames_dropped(self):
+        return self._frames.dropped
+
+    def start(self):
+        if self.is_running:
+            return
+        self.detector.start_camera()
+        self.lossless = not self.detector.source.realtime
+        self._frames = LatestFrameQueue(self.queue_size, drop_oldest=not self.lossless)
+        self._results = LatestFrameQueue(self.queue_size if self.lossless else 1, drop_oldest=not self.lossless)
+        self._running.set()
+        self._capture_thread = threading.Thread(target=self._capture_loop, name="frame-capture", daemon=True)
+        self._worker_thread = threading.Thread(target=self._worker_loop, name="frame-worker", daemon=True)
+        self._capture_thread.start()
+        self._worker_thread.start()
+        logger.info("Threaded frame pipeline started")
+
+    def stop(self, timeout=2.0):
+        if not self.is_running:
+            return
+        self._running.clear()
+        self._frames.close()
+        self._results.close()
+        for thread in (self._capture_thread, self._worker_thread):
+            if thread is not None and thread is not threading.current_thread():
+                thread.join(timeout)
+        self._capture_thread = None
+        self._worker_thread = None
+        logger.info(f"Threaded frame pipeline stopped "
+                    f"(captured={self.frames_captured}, processed={self.frames_processed}, "
+                    f"dropped={self.frames_dropped})")
+
+    def latest(self, timeout=0):
+        return self._results.get(timeout)
+
+    def _capture_loop(self):
+        profiler = self.detector.profiler
+        while self._running.is_set():
+            start = time.perf_counter_ns()
+            frame, timestamp = self.detector.read_frame()
+            profiler.record("capture", time.perf_counter_ns() - start)
+            if frame is None:
+                if self.lossless:
+                    # End of a recorded source: queued behind the pending frames so they are drained first
+                    self._frames.put((None, None))
+                    return
+                self._results.put((None, False, self.detector._empty_metrics()))
+                time.sleep(0.03)
+                continue
+            self.frames_captured += 1
+            self._frames.put((frame, timestamp))
+
+    def _worker_loop(self):
+        while self._running.is_set():
+            item = self._frames.get(timeout=0.1)
+            if item is None:
+                continue
+            frame, timestamp = item
+            if frame is None:
+                self._results.put((None, False, self.detector._empty_metrics()))
+                continue
+            try:
+                result = self.detector.analyze_frame(frame, timestamp)
+            except Exception as e:
+                logger.error(f"Frame analysis failed: {e}")
+                continue
+            self.frames_processed += 1
+            self._results.put(result)
@@ -0,0 +1,375 @@
+import os
+import time
+import logging
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class FrameSource:
+    """Common interface for everything the detector can read frames from.
+
+    ``read()`` returns ``(ok, frame, timestamp)`` where ``timestamp`` is in seconds on the
+    source's own clock: wall-clock time for a live camera, media time for recorded footage.
+    Recorded sources are read as fast as the consumer asks unless ``realtime`` is set.
+    """
+
+    realtime = False
+
+    def open(self):
+        pass
+
+    def isOpened(self):
+        raise NotImplementedError
+
+    def read(self):
+        raise NotImplementedError
+
+    def release(self):
+        pass
+
+    def __iter__(self):
+        while True:
+            ok, frame, timestamp = self.read()
+            if not ok:
+                return
+            yield frame, timestamp
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class _PacedSource(FrameSource):
+    def __init__(self, realtime=False):
+        self.realtime = realtime
+        self._pace_origin = None
+
+    def _pace(self, timestamp):
+        if not self.realtime:
+            return
+        now = time.perf_counter()
+        if self._pace_origin is None:
+            self._pace_origin = now - timestamp
+            return
+        delay = self._pace_origin + timestamp - now
+        if delay > 0:
+            time.sleep(delay)
+
+
+class CameraSource(FrameSource):
+    realtime = True
+
+    def __init__(self, camera_id=0, width=640, height=480, fps=30, fallback_ids=(1,), backends=None):
+        self.camera_ids = [camera_id] + [i for i in fallback_ids if i != camera_id]
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.backends = backends or [cv2.CAP_ANY, cv2.CAP_DSHOW, cv2.CAP_MSMF]
+        self.capture = None
+
+    def open(self):
+        if self.isOpened():
+            return
+        for index in self.camera_ids:
+            for backend in self.backends:
+                try:
+                    self.capture = cv2.VideoCapture(index, backend)
+                    if self.capture.isOpened():
+                        break
+                    self.capture.release()
+                    self.capture = None
+                except Exception:
+                    self.capture = None
+            if self.isOpened():
+                break
+        if not self.isOpened():
+            raise IOError("Cannot open camera")
+        self.capture.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
+        self.capture.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
+        self.capture.set(cv2.CAP_PROP_FPS, self.fps)
+
+    def isOpened(self):
+        return self.capture is not None and self.capture.isOpened()
+
+    def read(self):
+        if not self.isOpened():
+            return False, None, None
+        ret, frame = self.capture.read()
+        if not ret or frame is None:
+            return False, None, None
+        return True, frame, time.time()
+
+    def release(self):
+        if self.capture is not None:
+            self.capture.release()
+            self.capture = None
+
+
+class VideoFileSource(_PacedSource):
+    def __init__(self, path, realtime=False, start_frame=0):
+        super().__init__(realtime)
+        self.path = path
+        self.start_frame = start_frame
+        self.capture = None
+        self.fps = 0.0
+        self.frame_count = 0
+        self.position = 0
+
+    def open(self):
+        if self.isOpened():
+            return
+        self.capture = cv2.VideoCapture(self.path)
+        if not self.capture.isOpened():
+            self.capture = None
+            raise IOError(f"Cannot open video file {self.path}")
+        self.fps = self.capture.get(cv2.CAP_PROP_FPS) or 30.0
+        self.frame_count = int(self.capture.get(cv2.CAP_PROP_FRAME_COUNT))
+        if self.start_frame:
+            self.capture.set(cv2.CAP_PROP_POS_FRAMES, self.start_frame)
+        self.position = self.start_frame
+        self._pace_origin = None
+
+    def isOpened(self):
+        return self.capture is not None and self.capture.isOpened()
+
+    def read(self):
+        if not self.isOpened():
+            return False, None, None
+        ret, frame = self.capture.read()
+        if not ret or frame is None:
+            return False, None, None
+        # POS_MSEC is unreliable for some containers, so derive media time from the frame index
+        timestamp = self.position / self.fps
+        self.position += 1
+        self._pace(timestamp)
+        return True, frame, timestamp
+
+    def release(self):
+        if self.capture is not None:
+            self.capture.release()
+            self.capture = None
+
+
+class ImageDirectorySource(_PacedSource):
+    def __init__(self, directory, fps=30.0, extensions=('.png',), realtime=False):
+        super().__init__(realtime)
+        self.directory = directory
+        self.fps = fps
+        self.extensions = tuple(ext.lower() for ext in extensions)
+        self.files = None
+        self.position = 0
+
+    def open(self):
+        if self.files is not None:
+            return
+        if not os.path.isdir(self.directory):
+            raise IOError(f"Image directory not found: {self.directory}")
+        self.files = sorted(f for f in os.listdir(self.directory) if f.lower().endswith(self.extensions))
+        self.position = 0
+        self._pace_origin = None
+
+    def isOpened(self):
+        return self.files is not None
+
+    def read(self):
+        if self.files is None:
+            return False, None, None
+        while self.position < len(self.files):
+            path = os.path.join(self.directory, self.files[self.position])
+            timestamp = self.position / self.fps
+            self.position += 1
+            frame = cv2.imread(path, cv2.IMREAD_COLOR)
+            if frame is None:
+                logger.warning(f"Skipping unreadable image {path}")
+                continue
+            self._pace(timestamp)
+            return True, frame, timestamp
+        return False, None, None
+
+    def release(self):
+        self.files = None
+
+
+class MemoryFrameSource(_PacedSource):
+    """Serves preloaded frames; used for benchmarks and tests that must not touch disk or camera."""
+
+    def __init__(self, frames, fps=30.0, realtime=False):
+        super().__init__(realtime)
+        self.frames = frames
+        self.fps = fps
+        self.position = 0
+        self._opened = True
+
+    def open(self):
+        self._opened = True
+
+    def isOpened(self):
+        return self._opened
+
+    def read(self):
+        if not self._opened or self.position >= len(self.frames):
+            return False, None, None
+        timestamp = self.position / self.fps
+        frame = self.frames[self.position].copy()
+        self.position += 1
+        self._pace(timestamp)
+        return True, frame, timestamp
+
+    def rewind(self):
+        self.position = 0
+        self._pace_origin = None
+
+    def release(self):
+        self._opened = False
+
+
+class _SharedMemoryRing:
+    # Layout: header int64[2] = (next sequence number, closed flag),
+    # then per-slot float64[2] = (sequence number, timestamp), then the frame slots.
+    # A slot's sequence number is -1 while the writer is filling it.
+    HEADER_BYTES = 16
+
+    def __init__(self, shm, shape, slots):
+        self.shm = shm
+        self.shape = tuple(shape)
+        self.slots = slots
+        buf = shm.buf
+        self.header = np.ndarray((2,), dtype=np.int64, buffer=buf, offset=0)
+        self.meta = np.ndarray((slots, 2), dtype=np.float64, buffer=buf, offset=self.HEADER_BYTES)
+        self.frames = np.ndarray((slots,) + self.shape, dtype=np.uint8, buffer=buf,
+                                 offset=self.HEADER_BYTES + self.meta.nbytes)
+
+    @classmethod
+    def nbytes(cls, shape, slots):
+        return cls.HEADER_BYTES + slots * 16 + slots * int(np.prod(shape))
+
+    def detach(self):
+        self.header = self.meta = self.frames = None
+        self.shm.close()
+
+
+def _attach_shared_memory(name):
+    # Only the writer owns the segment; before Python 3.13 attaching also registers it with
+    # the resource tracker, which would unlink it when the reader exits.
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        shm = shared_memory.SharedMemory(name=name)
+        try:
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(shm._name, "shared_memory")
+        except Exception:
+            pass
+        return shm
+
+
+class SharedMemoryRingWriter:
+    """Producer side of a shared-memory frame ring, e.g. a separate capture process."""
+
+    def __init__(self, shape, slots=4, name=None):
+        shm = shared_memory.SharedMemory(name=name, create=True, size=_SharedMemoryRing.nbytes(shape, slots))
+        self.ring = _SharedMemoryRing(shm, shape, slots)
+        self.ring.header[:] = 0
+        self.ring.meta[:] = -1
+
+    @property
+    def name(self):
+        return self.ring.shm.name
+
+    def write(self, frame, timestamp=None):
+        ring = self.ring
+        seq = int(ring.header[0])
+        slot = seq % ring.slots
+        ring.meta[slot, 0] = -1
+        ring.frames[slot] = frame
+        ring.meta[slot, 1] = time.time() if timestamp is None else timestamp
+        ring.meta[slot, 0] = seq
+        ring.header[0] = seq + 1
+
+    def close(self):
+        self.ring.header[1] = 1
+
+    def unlink(self):
+        shm = self.ring.shm
+        self.ring.detach()
+        shm.unlink()
+
+
+class SharedMemoryRingSource(FrameSource):
+    """Consumer side of a SharedMemoryRingWriter. Frames overwritten before they were read are counted in ``dropped``."""
+
+    realtime = True
+
+    def __init__(self, name, shape, slots=4, timeout=1.0, poll_interval=0.001):
+        self.name = name
+        self.shape = tuple(shape)
+        self.slots = slots
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self.ring = None
+        self.next_seq = 0
+        self.dropped = 0
+
+    def open(self):
+        if self.ring is not None:
+            return
+        try:
+            shm = _attach_shared_memory(self.name)
+        except FileNotFoundError:
+            raise IOError(f"Shared memory ring not found: {self.name}")
+        self.ring = _SharedMemoryRing(shm, self.shape, self.slots)
+        self.next_seq = int(self.ring.header[0])
+
+    def isOpened(self):
+        return self.ring is not None
+
+    def read(self):
+        ring = self.ring
+        if ring is None:
+            return False, None, None
+        deadline = time.perf_counter() + self.timeout
+        while True:
+            head = int(ring.header[0])
+            if head > self.next_seq:
+                if head - self.next_seq > ring.slots:
+                    self.dropped += head - ring.slots - self.next_seq
+                    self.next_seq = head - ring.slots
+                seq = self.next_seq
+                slot = seq % ring.slots
+                self.next_seq += 1
+                if ring.meta[slot, 0] != seq:
+                    self.dropped += 1
+                    continue
+                frame = ring.frames[slot].copy()
+                timestamp = float(ring.meta[slot, 1])
+                if ring.meta[slot, 0] != seq:
+                    self.dropped += 1
+                    continue
+                return True, frame, timestamp
+            if ring.header[1] or time.perf_counter() >= deadline:
+                return False, None, None
+            time.sleep(self.poll_interval)
+
+    def release(self):
+        if self.ring is not None:
+            self.ring.detach()
+            self.ring = None
+
+
+def open_source(spec, config=None, realtime=False):
+    """Build a source from a CLI-style spec: a camera index, a video file or a directory of PNG frames."""
+    if spec is None or str(spec).isdigit():
+        from src.configs.config import Config
+        config = config or Config()
+        camera_id = config.CAMERA_ID if spec is None else int(spec)
+        return CameraSource(camera_id, config.CAMERA_WIDTH, config.CAMERA_HEIGHT, config.CAMERA_FPS)
+    if os.path.isdir(spec):
+        return ImageDirectorySource(spec, realtime=realtime)
+    return VideoFileSource(spec, realtime=realtime)
@@ -1,35 +1,227 @@
 import os
-import urllib.request
 import bz2
+import json
+import hashlib
+import tarfile
+import tempfile
+import urllib.request
 import dlib
 import logging
 from src.configs.config import Config
 
 logger = logging.getLogger(__name__)
 
+CHUNK_SIZE = 1 << 20
+
+_warned_unpinned = set()
+
+
+class ModelIntegrityError(IOError):
+    pass
+
+
+def file_sha256(path, chunk_size=CHUNK_SIZE):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class _Bz2Stream:
+    """Incremental bz2 decompression that also handles multi-stream files (e.g. from pbzip2)."""
+
+    def __init__(self):
+        self._decompressor = bz2.BZ2Decompressor()
+        self._in_stream = False
+
+    def feed(self, data):
+        out = []
+        while data:
+            self._in_stream = True
+            out.append(self._decompressor.decompress(data))
+            if not self._decompressor.eof:
+                break
+            data = self._decompressor.unused_data
+            self._decompressor = bz2.BZ2Decompressor()
+            self._in_stream = False
+        return b''.join(out)
+
+    @property
+    def complete(self):
+        return not self._in_stream
+
+
 class ModelManager:
+    """Model store for the files in Config.DATA_DIR.
+
+    Every file is described in the manifest (Config.MODEL_MANIFEST): name on disk, source URL,
+    compression and pinned SHA-256. Downloads and local installs are decompressed chunk by chunk,
+    hashed while written to a temp file next to the target and only renamed into place once the
+    hash matches, so a truncated or corrupt model never replaces a good one.
+    """
+
     def __init__(self):
         self.config = Config()
         self._detector = None
         self._predictor = None
+        self.manifest = self._load_manifest()
 
-    def download_model(self):
-        model_file = self.config.MODEL_DAT
-        model_bz2 = model_file + ".bz2"
-        os.makedirs(self.config.DATA_DIR, exist_ok=True)
+    def _default_manifest(self):
+        config = self.config
+        return {
+            'landmarks': {'file': os.path.basename(config.MODEL_DAT), 'url': config.MODEL_DAT_URL,
+                          'compression': 'bz2', 'sha256': None},
+            'dnn_prototxt': {'file': os.path.basename(config.DNN_PROTOTXT), 'url': config.DNN_PROTOTXT_URL,
+                             'compression': None, 'sha256': None},
+            'dnn_caffemodel': {'file': os.path.basename(config.DNN_CAFFEMODEL), 'url': config.DNN_CAFFEMODEL_URL,
+                               'compression': None, 'sha256': None},
+            'cnn': {'file': os.path.basename(config.CNN_FACE_MODEL), 'url': config.CNN_FACE_MODEL_URL,
+                    'compression': 'bz2', 'sha256': None},
+        }
 
-        if not os.path.exists(model_file):
-            logger.info(f"Downloading model to {model_file}")
+    def _load_manifest(self):
+        manifest = self._default_manifest()
+        path = self.config.MODEL_MANIFEST
+        if os.path.exists(path):
             try:
-                urllib.request.urlretrieve(self.config.MODEL_DAT_URL, model_bz2)
-                with open(model_file, 'wb') as new_file, bz2.BZ2File(model_bz2, 'rb') as file:
-                    new_file.write(file.read())
-                os.remove(model_bz2)
-                logger.info(f"Model downloaded and extracted to {model_file}")
-            except Exception as e:
-                logger.error(f"Model download or extraction failed: {e}")
-                raise
-        return model_file
+                with open(path, 'r', encoding='utf-8') as f:
+                    for name, entry in json.load(f).items():
+                        manifest.setdefault(name, {}).update(entry)
+            except (OSError, ValueError) as e:
+                logger.error(f"Cannot read model manifest {path}: {e}")
+        for name, entry in manifest.items():
+            if not entry.get('sha256') and entry['file'] not in _warned_unpinned:
+                _warned_unpinned.add(entry['file'])
+                logger.warning(f"No pinned SHA-256 for model '{name}' ({entry['file']}); integrity is not checked")
+        return manifest
+
+    def path(self, name):
+        return os.path.join(self.config.DATA_DIR, self.manifest[name]['file'])
+
+    def verify(self, name):
+        """Check an installed file against its pinned hash; unpinned files only have to exist."""
+        path = self.path(name)
+        if not os.path.exists(path):
+            return False
+        expected = self.manifest[name].get('sha256')
+        if not expected:
+            return True
+        # Hashing ~100 MB on every start is wasteful; trust a stamp written for this exact file
+        stamp_path = path + '.sha256'
+        st = os.stat(path)
+        stamp = f"{expected} {st.st_size} {st.st_mtime_ns}"
+        try:
+            with open(stamp_path, 'r', encoding='utf-8') as f:
+                if f.read().strip() == stamp:
+                    return True
+        except OSError:
+            pass
+        actual = file_sha256(path)
+        if actual != expected:
+            logger.error(f"Model {path} failed verification: sha256 {actual}, expected {expected}")
+            return False
+        try:
+            with open(stamp_path, 'w', encoding='utf-8') as f:
+                f.write(stamp)
+        except OSError:
+            pass
+        return True
+
+    def _write_verified(self, name, stream, compressed):
+        """Copy a binary stream into the store: decompress, hash, fsync, then atomically rename."""
+        entry = self.manifest[name]
+        target = self.path(name)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        decompressor = _Bz2Stream() if compressed else None
+        digest = hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(prefix=entry['file'] + '.', suffix='.part', dir=os.path.dirname(target))
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                for chunk in iter(lambda: stream.read(CHUNK_SIZE), b''):
+                    if decompressor is not None:
+                        chunk = decompressor.feed(chunk)
+                    digest.update(chunk)
+                    out.write(chunk)
+                if decompressor is not None and (not decompressor.complete or out.tell() == 0):
+                    raise ModelIntegrityError(f"Truncated bz2 data for {entry['file']}")
+                out.flush()
+                os.fsync(out.fileno())
+            actual = digest.hexdigest()
+            expected = entry.get('sha256')
+            if expected and actual != expected:
+                raise ModelIntegrityError(f"sha256 mismatch for {entry['file']}: {actual}, expected {expected}")
+            if not expected:
+                logger.warning(f"Installed unpinned model {entry['file']} (sha256 {actual})")
+            os.replace(tmp_path, target)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        logger.info(f"Installed model {target}")
+        return target
+
+    def download(self, name):
+        entry = self.manifest[name]
+        logger.info(f"Downloading {entry['file']} from {entry['url']}")
+        try:
+            with urllib.request.urlopen(entry['url'], timeout=60) as response:
+                return self._write_verified(name, response, entry.get('compression') == 'bz2')
+        except Exception as e:
+            logger.error(f"Model download failed for {entry['file']}: {e}")
+            raise
+
+    def ensure(self, name):
+        if not self.verify(name):
+            self.download(name)
+        return self.path(name)
+
+    def install_from(self, source, names=None):
+        """Install models from a local directory or tarball (plain or .bz2 files, matched by file name)."""
+        names = list(names or self.manifest)
+        installed = []
+        if os.path.isdir(source):
+            for name in names:
+                filename = self.manifest[name]['file']
+                for candidate, compressed in ((filename, False), (filename + '.bz2', True)):
+                    path = os.path.join(source, candidate)
+                    if os.path.exists(path):
+                        with open(path, 'rb') as f:
+                            installed.append(self._write_verified(name, f, compressed))
+                        break
+        else:
+            with tarfile.open(source, 'r:*') as tar:
+                members = {os.path.basename(m.name): m for m in tar.getmembers() if m.isfile()}
+                for name in names:
+                    filename = self.manifest[name]['file']
+                    for candidate, compressed in ((filename, False), (filename + '.bz2', True)):
+                        if candidate in members:
+                            with tar.extractfile(members[candidate]) as f:
+                                installed.append(self._write_verified(name, f, compressed))
+                            break
+        missing = [n for n in names if self.path(n) not in installed]
+        if missing:
+            logger.warning(f"Not found in {source}: {', '.join(self.manifest[n]['file'] for n in missing)}")
+        return installed
+
+    def pin(self, names=None):
+        """Record the hashes of the currently installed files in the manifest file."""
+        path = self.config.MODEL_MANIFEST
+        manifest = {}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        for name in names or self.manifest:
+            if os.path.exists(self.path(name)):
+                self.manifest[name]['sha256'] = file_sha256(self.path(name))
+                manifest[name] = self.manifest[name]
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(path + '.tmp', path)
+        return manifest
+
+    def download_model(self):
+        return self.ensure('landmarks')
 
     @property
     def detector(self):
@@ -39,46 +231,11 @@ class ModelManager:
         return self._detector
 
     def download_dnn_models(self):
-        proto_url = "https://raw.githubusercontent.com/opencv/opencv/master/samples/dnn/face_detector/deploy.prototxt"
-        model_url = "https://github.com/opencv/opencv_3rdparty/raw/dnn_samples_face_detector_20170830/res10_300x300_ssd_iter_140000.caffemodel"
-        os.makedirs(self.config.DATA_DIR, exist_ok=True)
-        proto_path = self.config.DNN_PROTOTXT
-        model_path = self.config.DNN_CAFFEMODEL
-        if not os.path.exists(proto_path):
-            logger.info(f"Downloading DNN prototxt to {proto_path}")
-            try:
-                urllib.request.urlretrieve(proto_url, proto_path)
-                logger.info("DNN prototxt downloaded")
-            except Exception as e:
-                logger.error(f"Failed to download DNN prototxt: {e}")
-                raise
-        if not os.path.exists(model_path):
-            logger.info(f"Downloading DNN caffemodel to {model_path}")
-            try:
-                urllib.request.urlretrieve(model_url, model_path)
-                logger.info("DNN caffemodel downloaded")
-            except Exception as e:
-                logger.error(f"Failed to download DNN caffemodel: {e}")
-                raise
+        self.ensure('dnn_prototxt')
+        self.ensure('dnn_caffemodel')
 
     def download_cnn_face_model(self):
-        import bz2
-        model_path = self.config.CNN_FACE_MODEL
-        if os.path.exists(model_path):
-            return
-        url = self.config.CNN_FACE_MODEL_URL
-        bz2_path = model_path + ".bz2"
-        os.makedirs(self.config.DATA_DIR, exist_ok=True)
-        logger.info(f"Downloading CNN face model from {url}")
-        try:
-            urllib.request.urlretrieve(url, bz2_path)
-            with open(model_path, 'wb') as new_file, bz2.BZ2File(bz2_path, 'rb') as f:
-                new_file.write(f.read())
-            os.remove(bz2_path)
-            logger.info(f"CNN face model extracted to {model_path}")
-        except Exception as e:
-            logger.error(f"CNN face model download failed: {e}")
-            raise
+        self.ensure('cnn')
 
     @property
     def predictor(self):
@@ -90,3 +247,33 @@ class ModelManager:
                 logger.error(f"Predictor initialization failed: {e}")
                 raise
         return self._predictor
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Install and verify detector models")
+    parser.add_argument('--install-from', metavar='PATH', help="Local directory or tarball with model files")
+    parser.add_argument('--download', action='store_true', help="Download missing or corrupt models")
+    parser.add_argument('--pin', action='store_true', help="Write hashes of installed models into the manifest")
+    args = parser.parse_args(argv)
+
+    manager = ModelManager()
+    if args.install_from:
+        manager.install_from(args.install_from)
+    if args.download:
+        for name in manager.manifest:
+            manager.ensure(name)
+    if args.pin:
+        manager.pin()
+    ok = True
+    for name in manager.manifest:
+        status = "ok" if manager.verify(name) else "MISSING/CORRUPT"
+        ok = ok and status == "ok"
+        logger.info(f"{name:<15} {manager.path(name)}: {status}")
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    import sys
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    sys.exit(main())
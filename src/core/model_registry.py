@@ -0,0 +1,173 @@
+import os
+import time
+import logging
+import threading
+
+import cv2
+import dlib
+
+from src.configs.config import Config
+from src.core.model_manager import ModelManager
+
+logger = logging.getLogger(__name__)
+
+MODEL_NAMES = ("haar", "dnn", "cnn", "hog", "landmarks")
+
+
+class ModelRegistry:
+    """Heavy models shared by every DrowsinessDetector session in the process.
+
+    Each model is loaded at most once, on first use or by a background ``warm_up()``; loading
+    one backend never waits for another. cv2.dnn.Net, the dlib CNN and HOG detectors and the
+    Haar cascade keep scratch buffers, so inference on them runs under ``lock(name)``; the
+    landmark predictor is stateless and is called concurrently.
+    """
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, config=None):
+        self.config = config or Config()
+        self.model_manager = ModelManager()
+        self._models = {}
+        self._load_locks = {name: threading.Lock() for name in MODEL_NAMES}
+        self._locks = {name: threading.Lock() for name in MODEL_NAMES}
+        self.load_times = {}
+        self.errors = {}
+        self._warming = set()
+        self._warmup_lock = threading.Lock()
+        self.created_at = time.perf_counter()
+
+    @classmethod
+    def shared(cls):
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    def lock(self, name):
+        return self._locks[name]
+
+    def get(self, name):
+        """The loaded model, or None if it is unavailable; a failed load is kept until ``reload()``."""
+        if name in self._models:
+            return self._models[name]
+        with self._load_locks[name]:
+            if name not in self._models:
+                start = time.perf_counter()
+                try:
+                    model = getattr(self, f"_load_{name}")()
+                except Exception as e:
+                    logger.error(f"Loading model {name} failed: {e}")
+                    self.errors[name] = e
+                    model = None
+                self.load_times[name] = time.perf_counter() - start
+                self._models[name] = model
+            return self._models[name]
+
+    def reload(self, names=MODEL_NAMES):
+        """Forget the given models, including failed loads, so the next use loads them again."""
+        for name in names:
+            with self._load_locks[name]:
+                self._models.pop(name, None)
+                self.errors.pop(name, None)
+                self.load_times.pop(name, None)
+
+    def ready(self, names=MODEL_NAMES):
+        """True once every model has finished loading or failed to (a failed one stays None)."""
+        return all(name in self._models for name in names)
+
+    def preload(self, names=MODEL_NAMES):
+        for name in names:
+            self.get(name)
+
+    def warm_up(self, names=MODEL_NAMES):
+        """Load the given models on daemon threads, one per backend; returns the started threads."""
+        with self._warmup_lock:
+            missing = [name for name in names if name not in self._models and name not in self._warming]
+            self._warming.update(missing)
+        threads = []
+        for name in missing:
+            thread = threading.Thread(target=self._warm, args=(name,), name=f"model-warmup-{name}", daemon=True)
+            thread.start()
+            threads.append(thread)
+        return threads
+
+    def _warm(self, name):
+        self.get(name)
+        with self._warmup_lock:
+            self._warming.discard(name)
+            finished = not self._warming
+        if finished:
+            logger.info("Model warm-up finished:\n" + self.startup_report())
+
+    def startup_report(self):
+        lines = []
+        for name in MODEL_NAMES:
+            if name in self.load_times:
+                status = "failed" if self._models.get(name) is None else "loaded"
+                lines.append(f"  {name:<10} {self.load_times[name] * 1000:8.0f} ms  {status}")
+            else:
+                lines.append(f"  {name:<10} {'-':>8}     not loaded")
+        total = (time.perf_counter() - self.created_at) * 1000
+        lines.append(f"  {'since init':<10} {total:8.0f} ms")
+        return "\n".join(lines)
+
+    def loaded(self):
+        return [name for name in MODEL_NAMES if self._models.get(name) is not None]
+
+    @property
+    def face_cascade(self):
+        return self.get("haar")
+
+    @property
+    def face_net_dnn(self):
+        return self.get("dnn")
+
+    @property
+    def face_cnn_detector(self):
+        return self.get("cnn")
+
+    @property
+    def hog_detector(self):
+        return self.get("hog")
+
+    @property
+    def landmark_predictor(self):
+        return self.get("landmarks")
+
+    def _load_haar(self):
+        cascade_path = cv2.data.haarcascades + "haarcascade_frontalface_default.xml"
+        if not os.path.exists(cascade_path):
+            logger.error(f"Haar cascade not found at {cascade_path}")
+            return None
+        logger.info("Initialized Haar cascade face detector")
+        return cv2.CascadeClassifier(cascade_path)
+
+    def _load_dnn(self):
+        # Missing or corrupt files (checked against the pinned hashes) are downloaded again
+        proto = self.model_manager.ensure('dnn_prototxt')
+        model = self.model_manager.ensure('dnn_caffemodel')
+        try:
+            net = cv2.dnn.readNetFromCaffe(proto, model)
+            logger.info("Initialized OpenCV DNN face detector (SSD)")
+            return net
+        except Exception as e:
+            logger.error(f"DNN face detector init failed: {e}")
+            return None
+
+    def _load_cnn(self):
+        model_path = self.model_manager.ensure('cnn')
+        try:
+            cnn_detector = dlib.cnn_face_detection_model_v1(model_path)
+            logger.info("Initialized dlib CNN face detector (MMOD)")
+            return cnn_detector
+        except Exception as e:
+            logger.error(f"CNN face detector init failed: {e}")
+            return None
+
+    def _load_hog(self):
+        return self.model_manager.detector
+
+    def _load_landmarks(self):
+        return self.model_manager.predictor
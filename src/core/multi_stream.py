@@ -0,0 +1,24 @@
+from src.core.session_manager import SessionManager
+
+
+class MultiStreamDetector(SessionManager):
+    """SessionManager over a fixed list of sources, indexed by position.
+
+    Each ``tick()`` runs the SSD face detector once over every stream that needs a detection
+    this frame (tracker keyframe or lost face) and returns one (frame, alert, metrics) per stream.
+    """
+
+    def __init__(self, sources, face_detectors=None, render_overlays=True, workers=1, models=None):
+        if not sources:
+            raise ValueError("MultiStreamDetector needs at least one frame source")
+        super().__init__(workers=workers, models=models, face_detectors=face_detectors,
+                         render_overlays=render_overlays)
+        for index, source in enumerate(sources):
+            self.add_session(index, source)
+
+    @property
+    def streams(self):
+        return list(self.sessions.values())
+
+    def tick(self):
+        return list(super().tick().values())
@@ -0,0 +1,116 @@
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+
+import numpy as np
+
+
+class StageProfiler:
+    """Per-stage wall-clock profiler for the detection pipeline.
+
+    ``span(name)`` measures one stage with ``perf_counter_ns``; spans with the same name
+    inside one frame are summed. ``end_frame()`` pushes the per-frame totals into rolling
+    windows used for p50/p95/p99, and ``count(name)`` tracks per-frame events such as
+    which face-detector fallback fired.
+    """
+
+    def __init__(self, window=300, enabled=True):
+        self.window = window
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._samples = {}
+            self._counters = {}
+            self._frame = {}
+            self._frame_counts = {}
+            self.frames = 0
+
+    def begin_frame(self):
+        self._frame = {}
+        self._frame_counts = {}
+
+    def span(self, name):
+        if not self.enabled:
+            return nullcontext()
+        return self._span(name)
+
+    @contextmanager
+    def _span(self, name):
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            self._frame[name] = self._frame.get(name, 0) + time.perf_counter_ns() - start
+
+    def count(self, name):
+        if self.enabled:
+            self._frame_counts[name] = self._frame_counts.get(name, 0) + 1
+
+    def record(self, name, duration_ns):
+        # For stages measured outside the frame being analysed, e.g. the capture thread
+        if not self.enabled:
+            return
+        with self._lock:
+            self._push(name, duration_ns)
+
+    def _push(self, name, duration_ns):
+        samples = self._samples.get(name)
+        if samples is None:
+            samples = self._samples[name] = deque(maxlen=self.window)
+        samples.append(duration_ns)
+
+    def end_frame(self):
+        if not self.enabled:
+            return {}
+        frame, counts = self._frame, self._frame_counts
+        with self._lock:
+            for name, duration in frame.items():
+                self._push(name, duration)
+            for name, n in counts.items():
+                self._counters[name] = self._counters.get(name, 0) + n
+            self.frames += 1
+        return {name: duration / 1e6 for name, duration in frame.items()}
+
+    def frame_counts(self):
+        return dict(self._frame_counts)
+
+    def stats(self):
+        with self._lock:
+            snapshot = {name: np.fromiter(s, dtype=np.int64, count=len(s)) for name, s in self._samples.items()}
+            counters = dict(self._counters)
+            frames = self.frames
+        stages = {}
+        for name, values in snapshot.items():
+            if len(values) == 0:
+                continue
+            p50, p95, p99 = np.percentile(values, [50, 95, 99]) / 1e6
+            stages[name] = {
+                'count': int(len(values)),
+                'mean_ms': float(values.mean() / 1e6),
+                'p50_ms': float(p50),
+                'p95_ms': float(p95),
+                'p99_ms': float(p99),
+                'max_ms': float(values.max() / 1e6),
+            }
+        return {'frames': frames, 'stages': stages, 'counters': counters}
+
+    def summary_text(self):
+        stats = self.stats()
+        lines = [f"Frames: {stats['frames']}",
+                 f"{'stage':<16}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}  (ms)"]
+        ordered = sorted(stats['stages'].items(), key=lambda kv: -kv[1]['p50_ms'])
+        for name, s in ordered:
+            lines.append(f"{name:<16}{s['p50_ms']:>9.2f}{s['p95_ms']:>9.2f}{s['p99_ms']:>9.2f}{s['max_ms']:>9.2f}")
+        if stats['counters']:
+            lines.append("Counters: " + ", ".join(f"{k}={v}" for k, v in sorted(stats['counters'].items())))
+        return "\n".join(lines)
+
+    def dump_json(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.stats(), f, indent=2)
+        return path
@@ -0,0 +1,138 @@
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+from src.configs.config import Config
+from src.core.detector import DrowsinessDetector, detect_faces_dnn_batch
+from src.core.model_registry import ModelRegistry
+from src.core.profiler import StageProfiler
+
+logger = logging.getLogger(__name__)
+
+
+class SessionManager:
+    """Monitors many seats from one process: one lightweight DrowsinessDetector session per
+    stream, all sharing a single ModelRegistry, scheduled over a thread pool.
+
+    Each ``tick()`` reads one frame per session in parallel, runs the SSD face detector once
+    for every session that needs a fresh detection, then analyses the sessions in parallel.
+    A session is only ever handled by one worker at a time, so its temporal state needs no locking.
+    """
+
+    def __init__(self, workers=None, models=None, face_detectors=None, render_overlays=True):
+        self.config = Config()
+        self.models = models or ModelRegistry.shared()
+        self.workers = workers or self.config.SESSION_WORKERS
+        self.face_detectors = face_detectors
+        self.render_overlays = render_overlays
+        self.sessions = {}
+        self.profiler = StageProfiler(window=self.config.PROFILE_WINDOW, enabled=self.config.PROFILING)
+        self._executor = None
+        self.ticks = 0
+        self.batched_frames = 0
+        self.last_tick_frames = 0
+
+    def __len__(self):
+        return len(self.sessions)
+
+    def add_session(self, name, source, face_detectors=None):
+        if name in self.sessions:
+            raise ValueError(f"Session already exists: {name}")
+        session = DrowsinessDetector(face_detectors=face_detectors or self.face_detectors, models=self.models)
+        session.render_overlays = self.render_overlays
+        session.set_source(source)
+        self.sessions[name] = session
+        logger.info(f"Added session {name} ({type(source).__name__})")
+        return session
+
+    def remove_session(self, name):
+        session = self.sessions.pop(name)
+        session.stop_camera()
+        logger.info(f"Removed session {name}")
+        return session
+
+    def start(self):
+        for session in self.sessions.values():
+            session.start_camera()
+        if self.workers > 1 and self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="session")
+        logger.info(f"Session manager started: {len(self.sessions)} sessions, {self.workers} workers")
+
+    def stop(self):
+        for session in self.sessions.values():
+            session.stop_camera()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        logger.info(f"Session manager stopped (ticks={self.ticks}, batched frames={self.batched_frames})")
+
+    def _map(self, fn, items):
+        if self._executor is None or len(items) < 2:
+            return [fn(item) for item in items]
+        return list(self._executor.map(fn, items))
+
+    def _resize(self, frame):
+        size = (self.config.CAMERA_WIDTH, self.config.CAMERA_HEIGHT)
+        if frame.shape[1] == size[0] and frame.shape[0] == size[1]:
+            return frame
+        return cv2.resize(frame, size)
+
+    def detect_batch(self, frames):
+        """SSD faces for each frame; empty results when the DNN is unavailable, so sessions fall back
+        to the next detectors in their chain."""
+        net = self.models.face_net_dnn
+        if net is None or not frames:
+            return [([], []) for _ in frames]
+        try:
+            with self.profiler.span("detect_dnn_batch"), self.models.lock("dnn"):
+                return detect_faces_dnn_batch(net, frames, self.config.DNN_CONFIDENCE_THRESHOLD,
+                                              self.config.DNN_NMS_THRESHOLD)
+        except Exception as e:
+            logger.warning(f"Batched dnn face detection failed: {e}")
+            return [([], []) for _ in frames]
+
+    def tick(self):
+        """Process one frame per session; returns {name: (frame, alert, metrics)}.
+
+        A session whose source has no frame right now reports (None, False, empty metrics).
+        """
+        profiler = self.profiler
+        profiler.begin_frame()
+        names = list(self.sessions)
+        sessions = [self.sessions[name] for name in names]
+        with profiler.span("capture"):
+            captured = self._map(lambda session: session.read_frame(), sessions)
+        frames = [None if frame is None else self._resize(frame) for frame, _ in captured]
+
+        pending = [i for i, frame in enumerate(frames) if frame is not None and sessions[i].wants_dnn()]
+        dnn_faces = dict(zip(pending, self.detect_batch([frames[i] for i in pending])))
+
+        def analyze(i):
+            if frames[i] is None:
+                return None, False, sessions[i]._empty_metrics()
+            return sessions[i].analyze_frame(frames[i], captured[i][1], dnn_faces=dnn_faces.get(i))
+
+        with profiler.span("analyze"):
+            results = self._map(analyze, range(len(sessions)))
+        profiler.end_frame()
+        self.ticks += 1
+        self.batched_frames += len(pending)
+        self.last_tick_frames = sum(frame is not None for frame in frames)
+        return dict(zip(names, results))
+
+    def run(self, callback=None, max_ticks=None):
+        """Tick until every non-realtime source is exhausted, ``max_ticks`` is reached or the callback returns False."""
+        self.start()
+        try:
+            while max_ticks is None or self.ticks < max_ticks:
+                results = self.tick()
+                if callback is not None and callback(results) is False:
+                    break
+                if self.last_tick_frames == 0:
+                    if not any(session.source.realtime for session in self.sessions.values()):
+                        break
+                    time.sleep(0.01)
+        finally:
+            self.stop()
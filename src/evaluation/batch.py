@@ -0,0 +1,162 @@
+"""Xử lý lại hàng loạt video đã ghi: python -m src.main --batch <thư_mục> [--workers N] [--output DIR]"""
+import csv
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import cv2
+
+from src.core.frame_source import VideoFileSource
+
+logger = logging.getLogger(__name__)
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv', '.m4v')
+
+FRAME_COLUMNS = [
+    'frame', 'timestamp', 'face_detected', 'detector', 'ear', 'mar', 'roll_angle', 'pitch_angle',
+    'blink_count', 'yawn_count', 'eye_counter', 'head_tilt_counter',
+    'drowsiness_detected', 'head_tilt_detected', 'fatigue_detected', 'alert',
+]
+
+SUMMARY_COLUMNS = [
+    'video', 'status', 'frames', 'duration_s', 'processing_s', 'processing_fps',
+    'face_detected_ratio', 'ear_mean', 'mar_mean', 'blink_total', 'yawn_total',
+    'drowsy_frames', 'drowsy_episodes', 'head_tilt_frames', 'fatigue_frames', 'alert_frames',
+    'output', 'error',
+]
+
+_worker_detector = None
+
+
+def find_videos(directory, extensions=VIDEO_EXTENSIONS):
+    videos = []
+    for root, _, files in os.walk(directory):
+        for name in files:
+            if name.lower().endswith(extensions):
+                videos.append(os.path.join(root, name))
+    return sorted(videos)
+
+
+def _init_worker():
+    # Models are loaded once per worker process and reused for every video it is handed
+    global _worker_detector
+    cv2.setNumThreads(1)
+    from src.core.detector import DrowsinessDetector
+    _worker_detector = DrowsinessDetector()
+    _worker_detector.render_overlays = False
+    _worker_detector.profiler.enabled = False
+
+
+def _output_path(video_path, input_dir, output_dir):
+    relative = os.path.splitext(os.path.relpath(video_path, input_dir))[0]
+    return os.path.join(output_dir, relative.replace(os.sep, '__') + '.csv')
+
+
+def process_video(video_path, input_dir, output_dir):
+    detector = _worker_detector
+    csv_path = _output_path(video_path, input_dir, output_dir)
+    summary = {'video': video_path, 'status': 'ok', 'output': csv_path, 'error': ''}
+    started = time.perf_counter()
+    source = VideoFileSource(video_path)
+    try:
+        source.open()
+        detector.set_source(source)
+        # Each video gets its own head-pose reference so results do not depend on scheduling order
+        detector.reset_head_reference()
+        ear_sum = mar_sum = 0.0
+        frames = faces = drowsy = episodes = tilted = fatigued = alerts = 0
+        was_drowsy = False
+        timestamp = 0.0
+        metrics = detector._empty_metrics()
+        with open(csv_path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(FRAME_COLUMNS)
+            for frame, timestamp in source:
+                _, alert, metrics = detector.analyze_frame(frame, timestamp)
+                writer.writerow([
+                    frames, f"{timestamp:.3f}", int(metrics['face_detected']), metrics.get('detector') or '',
+                    f"{metrics['ear']:.4f}", f"{metrics['mar']:.4f}",
+                    f"{metrics['roll_angle']:.2f}", f"{metrics['pitch_angle']:.2f}",
+                    metrics['blink_count'], metrics['yawn_count'], metrics['eye_counter'], metrics['head_tilt_counter'],
+                    int(metrics['drowsiness_detected']), int(metrics['head_tilt_detected']),
+                    int(metrics['fatigue_detected']), int(alert),
+                ])
+                frames += 1
+                if metrics['face_detected']:
+                    faces += 1
+                    ear_sum += metrics['ear']
+                    mar_sum += metrics['mar']
+                is_drowsy = metrics['drowsiness_detected']
+                drowsy += is_drowsy
+                episodes += is_drowsy and not was_drowsy
+                was_drowsy = is_drowsy
+                tilted += metrics['head_tilt_detected']
+                fatigued += metrics['fatigue_detected']
+                alerts += alert
+        elapsed = time.perf_counter() - started
+        summary.update({
+            'frames': frames,
+            'duration_s': round(timestamp + 1.0 / source.fps, 3) if frames else 0.0,
+            'processing_s': round(elapsed, 3),
+            'processing_fps': round(frames / elapsed, 2) if elapsed > 0 else 0.0,
+            'face_detected_ratio': round(faces / frames, 4) if frames else 0.0,
+            'ear_mean': round(ear_sum / faces, 4) if faces else 0.0,
+            'mar_mean': round(mar_sum / faces, 4) if faces else 0.0,
+            'blink_total': metrics['blink_count'],
+            'yawn_total': metrics['yawn_count'],
+            'drowsy_frames': drowsy,
+            'drowsy_episodes': episodes,
+            'head_tilt_frames': tilted,
+            'fatigue_frames': fatigued,
+            'alert_frames': alerts,
+        })
+    except Exception as e:
+        summary.update({'status': 'error', 'error': str(e)})
+    finally:
+        source.release()
+    return summary
+
+
+def write_summary(summaries, path):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=SUMMARY_COLUMNS, extrasaction='ignore')
+        writer.writeheader()
+        for row in sorted(summaries, key=lambda r: r['video']):
+            writer.writerow(row)
+
+
+def run_batch(input_dir, output_dir='batch_results', workers=None):
+    videos = find_videos(input_dir)
+    if not videos:
+        logger.warning(f"Không tìm thấy video nào trong {input_dir}")
+        return []
+    os.makedirs(output_dir, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+    workers = min(workers, len(videos))
+    logger.info(f"Xử lý {len(videos)} video với {workers} tiến trình...")
+
+    started = time.perf_counter()
+    summaries = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+        futures = {executor.submit(process_video, path, input_dir, output_dir): path for path in videos}
+        for done, future in enumerate(as_completed(futures), 1):
+            path = futures[future]
+            try:
+                summary = future.result()
+            except Exception as e:
+                summary = {'video': path, 'status': 'error', 'error': str(e)}
+            summaries.append(summary)
+            if summary['status'] == 'ok':
+                logger.info(f"[{done}/{len(videos)}] {path}: {summary['frames']} frames, "
+                            f"{summary['processing_fps']:.1f} FPS")
+            else:
+                logger.error(f"[{done}/{len(videos)}] {path}: lỗi - {summary['error']}")
+
+    summary_path = os.path.join(output_dir, 'summary.csv')
+    write_summary(summaries, summary_path)
+    total_frames = sum(s.get('frames', 0) for s in summaries)
+    elapsed = time.perf_counter() - started
+    logger.info(f"Hoàn tất {len(videos)} video ({total_frames} frames) trong {elapsed:.1f}s, "
+                f"tổng hợp: {summary_path}")
+    return summaries
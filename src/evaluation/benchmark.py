@@ -0,0 +1,281 @@
+"""Benchmark hiệu năng pipeline: python -m src.evaluation.benchmark [--video PATH] [--baseline FILE]"""
+import argparse
+import json
+import logging
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+from src.configs.config import Config
+from src.core.alert_system import AlertSystem
+from src.core.detector import non_max_suppression
+from src.core.facial_analyzer import manual_canny, vectorized_canny, _clahe, _label_components, compute_ratios
+from src.core.frame_source import MemoryFrameSource
+
+logger = logging.getLogger(__name__)
+
+
+def load_video_frames(video_path, max_frames=None):
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise IOError(f"Không thể mở video: {video_path}")
+    frames = []
+    while max_frames is None or len(frames) < max_frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+
+def synthetic_frames(count, width=640, height=480, seed=0):
+    """Khuôn mặt giả lập di chuyển nhẹ, mắt chớp theo chu kỳ và miệng mở/đóng."""
+    rng = np.random.default_rng(seed)
+    background = rng.integers(40, 90, (height, width, 3), dtype=np.uint8)
+    frames = []
+    for i in range(count):
+        frame = background.copy()
+        cx = width // 2 + int(40 * np.sin(i / 25.0))
+        cy = height // 2 + int(15 * np.cos(i / 40.0))
+        fw, fh = width // 6, height // 3
+        cv2.ellipse(frame, (cx, cy), (fw, fh), 0, 0, 360, (150, 180, 215), -1)
+        eye_open = max(1, int(10 * abs(np.cos(i * np.pi / 30.0))))
+        for ex in (cx - fw // 2, cx + fw // 2):
+            cv2.ellipse(frame, (ex, cy - fh // 4), (fw // 5, eye_open), 0, 0, 360, (245, 245, 245), -1)
+            cv2.circle(frame, (ex, cy - fh // 4), min(eye_open, 6), (40, 30, 20), -1)
+        mouth_open = 4 + int(14 * max(0.0, np.sin(i / 15.0)))
+        cv2.ellipse(frame, (cx, cy + fh // 2), (fw // 3, mouth_open), 0, 0, 360, (60, 40, 120), -1)
+        noise = rng.integers(-6, 7, frame.shape, dtype=np.int16)
+        frames.append(np.clip(frame.astype(np.int16) + noise, 0, 255).astype(np.uint8))
+    return frames
+
+
+def _latency_stats(samples_ns):
+    values = np.asarray(samples_ns, dtype=np.float64) / 1e6
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        'runs': int(len(values)),
+        'mean_ms': float(values.mean()),
+        'p50_ms': float(p50),
+        'p95_ms': float(p95),
+        'p99_ms': float(p99),
+        'min_ms': float(values.min()),
+    }
+
+
+def time_call(fn, repeat=50, warmup=3):
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter_ns()
+        fn()
+        samples.append(time.perf_counter_ns() - start)
+    stats = _latency_stats(samples)
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    stats['peak_kb'] = peak / 1024.0
+    return stats
+
+
+def benchmark_kernels(frames, repeat=50):
+    config = Config()
+    frame = cv2.resize(frames[len(frames) // 2], (config.CAMERA_WIDTH, config.CAMERA_HEIGHT))
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    h, w = gray.shape
+    eye = np.ascontiguousarray(gray[h // 3:h // 3 + 40, w // 2 - 60:w // 2 + 20])
+    edges = manual_canny(eye)
+
+    rng = np.random.default_rng(0)
+    xy = rng.uniform(0, 500, (200, 2))
+    size = rng.uniform(60, 160, (200, 1))
+    boxes = np.hstack([xy, xy + size]).tolist()
+    scores = rng.uniform(0.5, 1.0, 200).tolist()
+
+    landmarks = rng.integers(100, 500, (1000, 68, 2)).astype(np.int32)
+
+    alerts = AlertSystem()
+    text_frame = frame.copy()
+    kernels = {
+        'manual_canny': lambda: manual_canny(eye),
+        'vectorized_canny': lambda: vectorized_canny(eye),
+        'clahe': lambda: _clahe(gray),
+        'label_components': lambda: _label_components(edges > 0),
+        'compute_ratios': lambda: compute_ratios(landmarks[0]),
+        'compute_ratios_x1000': lambda: compute_ratios(landmarks),
+        'non_max_suppression': lambda: non_max_suppression(boxes, scores, config.DNN_NMS_THRESHOLD),
+        'render_drowsiness_alert': lambda: alerts.render_drowsiness_alert(frame.copy(), 1.0),
+        'render_distraction_alert': lambda: alerts.render_distraction_alert(frame.copy()),
+        'render_head_tilt_alert': lambda: alerts.render_head_tilt_alert(frame.copy()),
+        'render_fatigue_alert': lambda: alerts.render_fatigue_alert(frame.copy()),
+        'put_text_unicode': lambda: alerts.put_text_unicode(text_frame, "Không phát hiện khuôn mặt", (20, 30),
+                                                            config.ALERT_COLOR, font_size=24),
+    }
+    results = {}
+    for name, fn in kernels.items():
+        results[name] = time_call(fn, repeat=repeat)
+        logger.info(f"{name}: p50={results[name]['p50_ms']:.3f} ms")
+    return results
+
+
+def benchmark_pipeline(detector, frames, warmup=10, memory_frames=30):
+    """Phát lại các frame qua DrowsinessDetector.process_frame từ nguồn frame trong bộ nhớ."""
+    source = MemoryFrameSource(frames)
+    previous_source = detector.source
+    profiler_enabled = detector.profiler.enabled
+    detector.set_source(source)
+    detector.profiler.enabled = True
+    try:
+        for _ in range(min(warmup, len(frames))):
+            detector.process_frame()
+        source.rewind()
+        detector.set_source(source)
+        detector.profiler.reset()
+
+        start = time.perf_counter()
+        for _ in range(len(frames)):
+            detector.process_frame()
+        elapsed = time.perf_counter() - start
+        stats = detector.profiler.stats()
+
+        source.rewind()
+        detector.set_source(source)
+        tracemalloc.start()
+        for _ in range(min(memory_frames, len(frames))):
+            detector.process_frame()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    finally:
+        detector.set_source(previous_source)
+        detector.profiler.enabled = profiler_enabled
+
+    result = {
+        'frames': len(frames),
+        'elapsed_s': elapsed,
+        'fps': len(frames) / elapsed if elapsed > 0 else 0.0,
+        'stages': stats['stages'],
+        'counters': stats['counters'],
+        'peak_traced_mb': peak / (1024.0 * 1024.0),
+    }
+    logger.info(f"Pipeline: {result['fps']:.1f} FPS trên {len(frames)} frames")
+    return result
+
+
+def _peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024.0 * 1024.0) if sys.platform == 'darwin' else rss / 1024.0
+
+
+def environment_info():
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'opencv': cv2.__version__,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+
+def _latency_table(report):
+    table = {}
+    for name, stats in report.get('kernels', {}).items():
+        table[f"kernels.{name}"] = stats['p50_ms']
+    for name, stats in report.get('pipeline', {}).get('stages', {}).items():
+        table[f"pipeline.{name}"] = stats['p50_ms']
+    return table
+
+
+def compare_with_baseline(report, baseline, tolerance=0.15):
+    """So sánh p50 (ms) và FPS với baseline; trả về danh sách thay đổi, đánh dấu regression khi chậm hơn tolerance."""
+    current = _latency_table(report)
+    previous = _latency_table(baseline)
+    rows = []
+    for key in sorted(set(current) & set(previous)):
+        before, after = previous[key], current[key]
+        change = (after - before) / before if before > 0 else 0.0
+        rows.append({'metric': key, 'baseline_ms': before, 'current_ms': after,
+                     'change': change, 'regression': change > tolerance})
+    fps_before = baseline.get('pipeline', {}).get('fps')
+    fps_after = report.get('pipeline', {}).get('fps')
+    if fps_before and fps_after:
+        change = (fps_after - fps_before) / fps_before
+        rows.append({'metric': 'pipeline.fps', 'baseline': fps_before, 'current': fps_after,
+                     'change': change, 'regression': change < -tolerance})
+    return rows
+
+
+def run_benchmark(video=None, synthetic=300, max_frames=None, repeat=50, pipeline=True, kernels=True):
+    if video:
+        frames = load_video_frames(video, max_frames)
+        source = {'type': 'video', 'path': video}
+    else:
+        frames = synthetic_frames(synthetic)
+        source = {'type': 'synthetic', 'frames': synthetic}
+    if not frames:
+        raise ValueError("Không có frame nào để benchmark")
+
+    report = {'environment': environment_info(), 'source': source}
+    if kernels:
+        report['kernels'] = benchmark_kernels(frames, repeat=repeat)
+    if pipeline:
+        from src.core.detector import DrowsinessDetector
+        detector = DrowsinessDetector()
+        report['pipeline'] = benchmark_pipeline(detector, frames)
+    report['peak_rss_mb'] = _peak_rss_mb()
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark hiệu năng pipeline phát hiện ngủ gật")
+    parser.add_argument('--video', help="Video để phát lại (mặc định: chuỗi frame giả lập)")
+    parser.add_argument('--synthetic', type=int, default=300, help="Số frame giả lập khi không có --video")
+    parser.add_argument('--max-frames', type=int, default=None, help="Giới hạn số frame đọc từ video")
+    parser.add_argument('--repeat', type=int, default=50, help="Số lần lặp cho mỗi kernel")
+    parser.add_argument('--skip-pipeline', action='store_true', help="Chỉ đo các kernel")
+    parser.add_argument('--skip-kernels', action='store_true', help="Chỉ đo toàn bộ pipeline")
+    parser.add_argument('--output', default='benchmark_results.json', help="File JSON kết quả")
+    parser.add_argument('--baseline', help="File JSON baseline để so sánh")
+    parser.add_argument('--tolerance', type=float, default=0.15, help="Ngưỡng chậm hơn baseline bị coi là regression")
+    parser.add_argument('--fail-on-regression', action='store_true', help="Trả mã lỗi 1 khi có regression")
+    args = parser.parse_args(argv)
+
+    report = run_benchmark(video=args.video, synthetic=args.synthetic, max_frames=args.max_frames,
+                           repeat=args.repeat, pipeline=not args.skip_pipeline, kernels=not args.skip_kernels)
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        report['comparison'] = compare_with_baseline(report, baseline, args.tolerance)
+        regressions = [row for row in report['comparison'] if row['regression']]
+        for row in report['comparison']:
+            flag = " <-- REGRESSION" if row['regression'] else ""
+            logger.info(f"{row['metric']}: {row['change'] * 100:+.1f}%{flag}")
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    logger.info(f"Đã lưu kết quả benchmark vào {args.output}")
+
+    if regressions and args.fail_on_regression:
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    sys.exit(main())
@@ -0,0 +1,143 @@
+"""Cache landmark theo từng frame của video đã ghi, để đánh giá lại khi chỉ đổi ngưỡng mà không phải chạy lại detector."""
+import hashlib
+import json
+import logging
+import os
+
+import numpy as np
+
+from src.configs.config import Config
+from src.core.model_manager import ModelManager, file_sha256
+
+logger = logging.getLogger(__name__)
+
+CACHE_FORMAT_VERSION = 2
+FEATURE_BLOCK_SIZE = 16384
+
+LANDMARK_DTYPE = np.dtype([
+    ('shape', np.int16, (68, 2)),
+    ('box', np.int32, (4,)),
+    ('score', np.float32),
+    ('timestamp', np.float64),
+    ('valid', np.bool_),
+])
+
+
+def empty_records(count=0):
+    return np.zeros(count, dtype=LANDMARK_DTYPE)
+
+
+def video_fingerprint(video_path, samples=16, block_size=1 << 20):
+    """SHA-256 over the file size and evenly spaced blocks; cheap even for multi-GB recordings."""
+    size = os.path.getsize(video_path)
+    digest = hashlib.sha256(str(size).encode())
+    with open(video_path, 'rb') as f:
+        if size <= samples * block_size:
+            for chunk in iter(lambda: f.read(block_size), b''):
+                digest.update(chunk)
+        else:
+            step = (size - block_size) // (samples - 1)
+            for i in range(samples):
+                f.seek(i * step)
+                digest.update(f.read(block_size))
+    return digest.hexdigest()
+
+
+_digest_cache = {}
+
+
+def model_digest(manager, name):
+    """SHA-256 of an installed model: the pinned hash when the file verifies, else hashed from disk."""
+    path = manager.path(name)
+    if not os.path.exists(path):
+        return None
+    expected = manager.manifest[name].get('sha256')
+    if expected and manager.verify(name):
+        return expected
+    st = os.stat(path)
+    key = (path, st.st_size, st.st_mtime_ns)
+    if key not in _digest_cache:
+        _digest_cache[key] = file_sha256(path)
+    return _digest_cache[key]
+
+
+def model_version(config=None, face_detectors=None, face_tracking=None):
+    """Identifies everything that changes the cached landmarks: model contents, detector chain and preprocessing."""
+    config = config or Config()
+    manager = ModelManager()
+    models = {manager.manifest[name]['file']: model_digest(manager, name) for name in manager.manifest}
+    settings = {
+        'format': CACHE_FORMAT_VERSION,
+        'models': models,
+        'face_detectors': list(face_detectors or config.FACE_DETECTORS),
+        'frame_size': [config.CAMERA_WIDTH, config.CAMERA_HEIGHT],
+        'dnn_threshold': config.DNN_CONFIDENCE_THRESHOLD,
+        'face_tracking': [config.FACE_TRACKING if face_tracking is None else face_tracking,
+                          config.TRACKING_KEYFRAME_INTERVAL, config.TRACKING_MIN_OVERLAP,
+                          config.TRACKING_BOX_MARGIN],
+        'roi': [config.ROI_PREPROCESSING, config.ROI_PADDING, config.ROI_SIZE_STEP],
+    }
+    return hashlib.sha256(json.dumps(settings, sort_keys=True).encode()).hexdigest()
+
+
+class LandmarkCache:
+    """Memory-mapped .npy files of LANDMARK_DTYPE records, one per (video fingerprint, model version)."""
+
+    def __init__(self, cache_dir=None, config=None, face_detectors=None, face_tracking=None):
+        config = config or Config()
+        self.cache_dir = cache_dir or config.FEATURE_CACHE_DIR
+        self.version = model_version(config, face_detectors, face_tracking)
+
+    def path_for(self, video_path):
+        return os.path.join(self.cache_dir, f"{video_fingerprint(video_path)[:24]}-{self.version[:12]}.npy")
+
+    def load(self, video_path):
+        path = self.path_for(video_path)
+        if not os.path.exists(path):
+            return None
+        try:
+            records = np.load(path, mmap_mode='r')
+        except (OSError, ValueError) as e:
+            logger.warning(f"Cache landmark hỏng, bỏ qua {path}: {e}")
+            return None
+        if records.dtype != LANDMARK_DTYPE:
+            logger.warning(f"Cache landmark sai định dạng, bỏ qua {path}")
+            return None
+        logger.info(f"Dùng cache landmark {path} ({len(records)} frames)")
+        return records
+
+    def save(self, video_path, records):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self.path_for(video_path)
+        tmp_path = path + '.tmp'
+        out = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=LANDMARK_DTYPE, shape=(len(records),))
+        out[:] = records
+        out.flush()
+        del out
+        os.replace(tmp_path, path)
+        with open(os.path.splitext(path)[0] + '.json', 'w', encoding='utf-8') as f:
+            json.dump({'video': os.path.abspath(video_path), 'frames': len(records),
+                       'model_version': self.version}, f, indent=2)
+        logger.info(f"Đã lưu cache landmark {path} ({len(records)} frames)")
+        return path
+
+
+def landmark_features(records, block_size=FEATURE_BLOCK_SIZE):
+    """(N, 5) array of ear, mar, roll, pitch, face found computed from cached landmarks.
+
+    Valid records are scored ``block_size`` at a time, so only one block of a memory-mapped
+    cache is copied into RAM at once.
+    """
+    from src.core.facial_analyzer import compute_ratios
+
+    features = np.zeros((len(records), 5), dtype=np.float64)
+    valid = np.flatnonzero(records['valid'])
+    for i in range(0, len(valid), block_size):
+        block = valid[i:i + block_size]
+        ratios = compute_ratios(records['shape'][block])
+        features[block, 0] = ratios['ear']
+        features[block, 1] = ratios['mar']
+        features[block, 2] = ratios['roll_angle']
+        features[block, 3] = ratios['pitch_angle']
+        features[block, 4] = 1.0
+    return features
@@ -3,38 +3,206 @@ import time
 import logging
 import cv2
 import os
-from src.core.detector import manual_bgr_to_gray, manual_resize
+
+from src.evaluation.feature_cache import LANDMARK_DTYPE, LandmarkCache, empty_records, landmark_features
 
 logger = logging.getLogger(__name__)
 
 
+class _GrowableArray:
+    """Append-only column with amortized O(1) append; ``values`` is a view of the filled part."""
+
+    def __init__(self, dtype, capacity=1024):
+        self._data = np.empty(capacity, dtype=dtype)
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def values(self):
+        return self._data[:self._size]
+
+    def _reserve(self, extra):
+        needed = self._size + extra
+        if needed > len(self._data):
+            grown = np.empty(max(needed, 2 * len(self._data)), dtype=self._data.dtype)
+            grown[:self._size] = self._data[:self._size]
+            self._data = grown
+
+    def append(self, value):
+        if self._size == len(self._data):
+            self._reserve(1)
+        self._data[self._size] = value
+        self._size += 1
+
+    def extend(self, values):
+        values = np.asarray(values)
+        self._reserve(len(values))
+        self._data[self._size:self._size + len(values)] = values
+        self._size += len(values)
+
+    def clear(self):
+        self._size = 0
+
+
+def _classification_metrics(tp, tn, fp, fn):
+    total = tp + tn + fp + fn
+    accuracy = (tp + tn) / total if total > 0 else 0.0
+    precision = tp / (tp + fp) if (tp + fp) > 0 else 0.0
+    recall = tp / (tp + fn) if (tp + fn) > 0 else 0.0
+    f1 = 2 * precision * recall / (precision + recall) if (precision + recall) > 0 else 0.0
+    fpr = fp / (fp + tn) if (fp + tn) > 0 else 0.0
+    return {
+        'total_samples': total,
+        'true_positives': tp,
+        'true_negatives': tn,
+        'false_positives': fp,
+        'false_negatives': fn,
+        'accuracy': accuracy,
+        'precision': precision,
+        'recall': recall,
+        'f1_score': f1,
+        'false_positive_rate': fpr,
+    }
+
+
+def _run_lengths(mask, carry=0):
+    """Length of the run of True ending at each position; a run open before the batch starts at ``carry``."""
+    idx = np.arange(1, len(mask) + 1)
+    last_false = np.maximum.accumulate(np.where(mask, 0, idx))
+    runs = idx - last_false
+    if carry:
+        runs[last_false == 0] += carry
+    return runs
+
+
+def _clamped_counter(steps, start=0):
+    """c[n] = max(0, c[n-1] + steps[n]) with c[-1] = start, solved in closed form (Lindley recursion)."""
+    totals = start + np.cumsum(steps)
+    return totals - np.minimum(np.minimum.accumulate(totals), 0)
+
+
+def sensitivity_counts(ear, ground_truth, ear_thresholds, consec_frames, other=None, chunk_size=65536):
+    """Confusion counts for every (EAR threshold, consecutive frames, extra predictor) combination.
+
+    The prediction for combination (t, k, j) at frame n is ``run of ear < t ending at n >= k``
+    OR ``other[j, n]``. Run lengths for all thresholds are computed at once in time chunks (the open
+    run is carried across chunks), and the OR with ``other`` is resolved with matrix products.
+    Returns tp, fp, fn, tn as int64 arrays of shape (T, K, J); J is 1 without ``other``.
+    """
+    ear = np.asarray(ear)
+    gt = np.asarray(ground_truth, dtype=np.bool_)
+    thresholds = np.asarray(ear_thresholds, dtype=np.float64)[:, np.newaxis]
+    consec_frames = np.asarray(consec_frames, dtype=np.int64)
+    n = len(gt)
+    if other is None:
+        other = np.zeros((1, n), dtype=np.bool_)
+    n_t, n_k, n_j = len(thresholds), len(consec_frames), len(other)
+
+    eye_pos = np.zeros((n_t, n_k), dtype=np.int64)
+    eye_tp = np.zeros((n_t, n_k), dtype=np.int64)
+    both_pos = np.zeros((n_t, n_k, n_j), dtype=np.int64)
+    both_tp = np.zeros((n_t, n_k, n_j), dtype=np.int64)
+    carry = np.zeros(n_t, dtype=np.int64)
+    # float32 products stay exact while a chunk's counts fit in the 24-bit mantissa
+    chunk_size = min(chunk_size, 1 << 24)
+    for start in range(0, n, chunk_size):
+        stop = min(n, start + chunk_size)
+        mask = ear[np.newaxis, start:stop] < thresholds
+        idx = np.arange(1, stop - start + 1)
+        last_false = np.maximum.accumulate(np.where(mask, 0, idx), axis=1)
+        runs = idx - last_false
+        runs += carry[:, np.newaxis] * (last_false == 0)
+        carry = runs[:, -1].astype(np.int64)
+
+        g = gt[start:stop].astype(np.float32)
+        o = other[:, start:stop].astype(np.float32)
+        og = o * g
+        for ki, k in enumerate(consec_frames):
+            e = (runs >= k).astype(np.float32)
+            eye_pos[:, ki] += e.sum(axis=1).astype(np.int64)
+            eye_tp[:, ki] += np.rint(e @ g).astype(np.int64)
+            both_pos[:, ki, :] += np.rint(e @ o.T).astype(np.int64)
+            both_tp[:, ki, :] += np.rint(e @ og.T).astype(np.int64)
+
+    other_pos = other.sum(axis=1)
+    other_tp = (other & gt).sum(axis=1)
+    positives = int(gt.sum())
+    predicted = eye_pos[:, :, np.newaxis] + other_pos - both_pos
+    tp = eye_tp[:, :, np.newaxis] + other_tp - both_tp
+    fp = predicted - tp
+    fn = positives - tp
+    tn = n - tp - fp - fn
+    return tp, fp, fn, tn
+
+
 class MetricsCollector:
+    """Columnar per-frame collector: float32 EAR/MAR/angles, int64 nanosecond timestamps.
+
+    The confusion matrix is updated as samples arrive, so ``running_metrics()`` is O(1) mid-video.
+    """
+
     def __init__(self, ear_threshold=0.22, mar_threshold=0.3, head_tilt_threshold=45.0,
-                 ear_consec_frames=15, head_tilt_frames=20):
+                 ear_consec_frames=15, head_tilt_frames=20, capacity=4096):
         self.ear_threshold = ear_threshold
         self.mar_threshold = mar_threshold
         self.head_tilt_threshold = head_tilt_threshold
         self.ear_consec_frames = ear_consec_frames
         self.head_tilt_frames = head_tilt_frames
+        self.capacity = capacity
         self.reset()
 
     def reset(self):
-        self.ground_truth = []
-        self.predictions = []
-        self.ear_values = []
-        self.mar_values = []
-        self.roll_values = []
-        self.pitch_values = []
-        self.timestamps = []
+        self._ear = _GrowableArray(np.float32, self.capacity)
+        self._mar = _GrowableArray(np.float32, self.capacity)
+        self._roll = _GrowableArray(np.float32, self.capacity)
+        self._pitch = _GrowableArray(np.float32, self.capacity)
+        self._timestamps = _GrowableArray(np.int64, self.capacity)
+        self._predictions = _GrowableArray(np.bool_, self.capacity)
+        self._ground_truth = _GrowableArray(np.bool_, self.capacity)
+        # confusion[prediction, ground_truth]
+        self.confusion = np.zeros((2, 2), dtype=np.int64)
         self.eye_counter = 0
         self.head_tilt_counter = 0
 
-    def add_sample(self, ear, mar, roll_angle, pitch_angle, is_drowsy_ground_truth=None):
-        self.ear_values.append(ear)
-        self.mar_values.append(mar)
-        self.roll_values.append(roll_angle)
-        self.pitch_values.append(pitch_angle)
-        self.timestamps.append(time.time())
+    def __len__(self):
+        return len(self._ear)
+
+    @property
+    def ear_values(self):
+        return self._ear.values
+
+    @property
+    def mar_values(self):
+        return self._mar.values
+
+    @property
+    def roll_values(self):
+        return self._roll.values
+
+    @property
+    def pitch_values(self):
+        return self._pitch.values
+
+    @property
+    def timestamps(self):
+        return self._timestamps.values / 1e9
+
+    @property
+    def predictions(self):
+        return self._predictions.values
+
+    @property
+    def ground_truth(self):
+        return self._ground_truth.values
+
+    def add_sample(self, ear, mar, roll_angle, pitch_angle, is_drowsy_ground_truth=None, timestamp=None):
+        self._ear.append(ear)
+        self._mar.append(mar)
+        self._roll.append(roll_angle)
+        self._pitch.append(pitch_angle)
+        self._timestamps.append(time.time_ns() if timestamp is None else int(timestamp * 1e9))
 
         if ear < self.ear_threshold:
             self.eye_counter += 1
@@ -49,81 +217,145 @@ class MetricsCollector:
         head_tilt_pred = self.head_tilt_counter >= self.head_tilt_frames
 
         combined_pred = drowsy_pred or head_tilt_pred
-        self.predictions.append(combined_pred or (mar > self.mar_threshold))
+        self._predictions.append(combined_pred or (mar > self.mar_threshold))
+
+        if is_drowsy_ground_truth is not None:
+            self._add_ground_truth(np.array([is_drowsy_ground_truth], dtype=np.bool_))
+
+    def add_samples(self, ear, mar, roll_angle, pitch_angle, is_drowsy_ground_truth=None, timestamps=None):
+        """Vectorized add_sample for a whole batch; produces exactly the same predictions and counters."""
+        ear = np.asarray(ear, dtype=np.float64)
+        mar = np.asarray(mar, dtype=np.float64)
+        roll_angle = np.asarray(roll_angle, dtype=np.float64)
+        pitch_angle = np.asarray(pitch_angle, dtype=np.float64)
+        n = len(ear)
+        if n == 0:
+            return
+        self._ear.extend(ear)
+        self._mar.extend(mar)
+        self._roll.extend(roll_angle)
+        self._pitch.extend(pitch_angle)
+        if timestamps is None:
+            self._timestamps.extend(np.full(n, time.time_ns(), dtype=np.int64))
+        else:
+            self._timestamps.extend((np.asarray(timestamps, dtype=np.float64) * 1e9).astype(np.int64))
+
+        eye_runs = _run_lengths(ear < self.ear_threshold, self.eye_counter)
+        tilted = (np.abs(roll_angle) > self.head_tilt_threshold) | (np.abs(pitch_angle) > self.head_tilt_threshold)
+        tilt_counter = _clamped_counter(np.where(tilted, 1, -1), self.head_tilt_counter)
+        self.eye_counter = int(eye_runs[-1])
+        self.head_tilt_counter = int(tilt_counter[-1])
+
+        predictions = ((eye_runs >= self.ear_consec_frames) | (tilt_counter >= self.head_tilt_frames)
+                       | (mar > self.mar_threshold))
+        self._predictions.extend(predictions)
 
         if is_drowsy_ground_truth is not None:
-            self.ground_truth.append(is_drowsy_ground_truth)
+            self._add_ground_truth(np.asarray(is_drowsy_ground_truth, dtype=np.bool_))
+
+    def add_landmarks(self, records, is_drowsy_ground_truth=None):
+        """Replay cached landmark records (see feature_cache.LANDMARK_DTYPE); returns the (N, 5) features."""
+        features = landmark_features(records)
+        ear, mar, roll, pitch, _ = features.T
+        self.add_samples(ear, mar, roll, pitch, is_drowsy_ground_truth, timestamps=records['timestamp'])
+        return features
+
+    def _add_ground_truth(self, ground_truth):
+        # Ground truth k is scored against prediction k, as compute_metrics always did
+        start = len(self._ground_truth)
+        self._ground_truth.extend(ground_truth)
+        predictions = self._predictions.values[start:start + len(ground_truth)]
+        ground_truth = ground_truth[:len(predictions)]
+        np.add.at(self.confusion, (predictions.astype(np.intp), ground_truth.astype(np.intp)), 1)
+
+    def running_metrics(self):
+        (tn, fn), (fp, tp) = self.confusion.tolist()
+        return _classification_metrics(tp, tn, fp, fn)
 
     def compute_metrics(self):
-        if not self.ground_truth or not self.predictions:
+        if not len(self._ground_truth) or not len(self._predictions):
             logger.warning("Không có dữ liệu ground truth hoặc prediction để tính metrics")
             return {}
 
-        gt = np.array(self.ground_truth)
-        pred = np.array(self.predictions[:len(gt)])
-
-        tp = int(np.sum((pred == 1) & (gt == 1)))
-        tn = int(np.sum((pred == 0) & (gt == 0)))
-        fp = int(np.sum((pred == 1) & (gt == 0)))
-        fn = int(np.sum((pred == 0) & (gt == 1)))
-
-        accuracy = (tp + tn) / len(gt) if len(gt) > 0 else 0.0
-        precision = tp / (tp + fp) if (tp + fp) > 0 else 0.0
-        recall = tp / (tp + fn) if (tp + fn) > 0 else 0.0
-        f1 = 2 * precision * recall / (precision + recall) if (precision + recall) > 0 else 0.0
-        fpr = fp / (fp + tn) if (fp + tn) > 0 else 0.0
-
-        metrics = {
-            'total_samples': len(gt),
-            'true_positives': tp,
-            'true_negatives': tn,
-            'false_positives': fp,
-            'false_negatives': fn,
-            'accuracy': accuracy,
-            'precision': precision,
-            'recall': recall,
-            'f1_score': f1,
-            'false_positive_rate': fpr,
-        }
-
-        logger.info(f"Accuracy={accuracy:.3f}, Precision={precision:.3f}, "
-                    f"Recall={recall:.3f}, F1={f1:.3f}, FPR={fpr:.3f}")
+        metrics = self.running_metrics()
+        logger.info(f"Accuracy={metrics['accuracy']:.3f}, Precision={metrics['precision']:.3f}, "
+                    f"Recall={metrics['recall']:.3f}, F1={metrics['f1_score']:.3f}, "
+                    f"FPR={metrics['false_positive_rate']:.3f}")
         return metrics
 
     def ear_sensitivity_analysis(self, ear_range=None):
         if ear_range is None:
             ear_range = np.arange(0.16, 0.30, 0.02)
+        n = len(self._ground_truth)
+        if not n:
+            return []
+        ear_range = np.asarray(ear_range, dtype=np.float64)
+        tp, fp, fn, _ = sensitivity_counts(self.ear_values[:n], self.ground_truth, ear_range,
+                                           [self.ear_consec_frames])
         results = []
-        for threshold in ear_range:
-            self.ear_threshold = float(threshold)
-            self.eye_counter = 0
-            preds = []
-            for ear in self.ear_values:
-                if ear < self.ear_threshold:
-                    self.eye_counter += 1
-                else:
-                    self.eye_counter = 0
-                preds.append(self.eye_counter >= self.ear_consec_frames)
-            if self.ground_truth:
-                gt = np.array(self.ground_truth[:len(preds)])
-                pred = np.array(preds[:len(gt)])
-                tp = int(np.sum((pred == 1) & (gt == 1)))
-                fp = int(np.sum((pred == 1) & (gt == 0)))
-                fn = int(np.sum((pred == 0) & (gt == 1)))
-                precision = tp / (tp + fp) if (tp + fp) > 0 else 0.0
-                recall = tp / (tp + fn) if (tp + fn) > 0 else 0.0
-                f1 = 2 * precision * recall / (precision + recall) if (precision + recall) > 0 else 0.0
-                results.append({
-                    'ear_threshold': float(threshold),
-                    'precision': precision,
-                    'recall': recall,
-                    'f1_score': f1,
-                    'tp': tp, 'fp': fp, 'fn': fn
-                })
+        for i, threshold in enumerate(ear_range):
+            t, f_p, f_n = int(tp[i, 0, 0]), int(fp[i, 0, 0]), int(fn[i, 0, 0])
+            scores = _classification_metrics(t, 0, f_p, f_n)
+            results.append({
+                'ear_threshold': float(threshold),
+                'precision': scores['precision'],
+                'recall': scores['recall'],
+                'f1_score': scores['f1_score'],
+                'tp': t, 'fp': f_p, 'fn': f_n
+            })
         return results
 
+    def sensitivity_surface(self, ear_range=None, consec_range=None, mar_range=None, chunk_size=65536):
+        """Precision/recall surface over EAR threshold x consecutive frames x MAR (yawn) threshold.
+
+        Predictions follow add_sample: closed-eye run OR head tilt (current settings) OR MAR above
+        threshold. Arrays in the result are indexed [ear, consec, mar].
+        """
+        if ear_range is None:
+            ear_range = np.arange(0.16, 0.30, 0.02)
+        if consec_range is None:
+            consec_range = np.arange(5, 31, 5)
+        if mar_range is None:
+            mar_range = np.arange(0.3, 0.81, 0.05)
+        ear_range = np.asarray(ear_range, dtype=np.float64)
+        consec_range = np.asarray(consec_range, dtype=np.int64)
+        mar_range = np.asarray(mar_range, dtype=np.float64)
+        n = len(self._ground_truth)
+        if not n:
+            return {}
+
+        tilted = (np.abs(self.roll_values[:n]) > self.head_tilt_threshold) | \
+                 (np.abs(self.pitch_values[:n]) > self.head_tilt_threshold)
+        tilt_pred = _clamped_counter(np.where(tilted, 1, -1)) >= self.head_tilt_frames
+        other = (self.mar_values[:n][np.newaxis, :] > mar_range[:, np.newaxis]) | tilt_pred[np.newaxis, :]
+        tp, fp, fn, tn = sensitivity_counts(self.ear_values[:n], self.ground_truth, ear_range, consec_range,
+                                            other=other, chunk_size=chunk_size)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            precision = np.where(tp + fp > 0, tp / (tp + fp), 0.0)
+            recall = np.where(tp + fn > 0, tp / (tp + fn), 0.0)
+            f1 = np.where(precision + recall > 0, 2 * precision * recall / (precision + recall), 0.0)
+        best = np.unravel_index(np.argmax(f1), f1.shape)
+        return {
+            'ear_thresholds': ear_range,
+            'consec_frames': consec_range,
+            'mar_thresholds': mar_range,
+            'tp': tp, 'fp': fp, 'fn': fn, 'tn': tn,
+            'precision': precision,
+            'recall': recall,
+            'f1_score': f1,
+            'best': {
+                'ear_threshold': float(ear_range[best[0]]),
+                'ear_consec_frames': int(consec_range[best[1]]),
+                'mar_threshold': float(mar_range[best[2]]),
+                'precision': float(precision[best]),
+                'recall': float(recall[best]),
+                'f1_score': float(f1[best]),
+            },
+        }
+
     def summary_stats(self):
-        if not self.ear_values:
+        if not len(self):
             return {}
         return {
             'ear_mean': float(np.mean(self.ear_values)),
@@ -133,78 +365,177 @@ class MetricsCollector:
             'mar_mean': float(np.mean(self.mar_values)),
             'mar_std': float(np.std(self.mar_values)),
             'total_frames': len(self.ear_values),
-            'duration_seconds': self.timestamps[-1] - self.timestamps[0] if len(self.timestamps) > 1 else 0.0,
+            'duration_seconds': float(self.timestamps[-1] - self.timestamps[0]) if len(self) > 1 else 0.0,
         }
 
 
-def evaluate_on_video(video_path, config, output_dir='evaluation_results'):
-    """Đánh giá pipeline trên một video có sẵn (real data)."""
-    from src.core.detector import DrowsinessDetector
-    from src.core.facial_analyzer import FacialAnalyzer
-    from src.core.model_manager import ModelManager
-    import dlib
+class _LandmarkExtractor:
+    """Per-frame face box, score and landmarks through the same detector chain, tracker and
+    landmark model as DrowsinessDetector; models load once.
 
-    os.makedirs(output_dir, exist_ok=True)
+    ``tracking=False`` drops the face tracker so every frame runs the detector chain; a frame's
+    landmarks then no longer depend on earlier frames.
+    """
 
-    model_manager = ModelManager()
-    predictor = model_manager.predictor
-    analyzer = FacialAnalyzer()
-    cascade = cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
+    def __init__(self, face_detectors=None, tracking=True):
+        from src.core.detector import DrowsinessDetector
 
-    cap = cv2.VideoCapture(video_path)
-    if not cap.isOpened():
-        logger.error(f"Không thể mở video: {video_path}")
-        return
+        self.detector = DrowsinessDetector(face_detectors=face_detectors)
+        if not tracking:
+            self.detector.tracker = None
+        self.detector.render_overlays = False
+        self.detector.profiler.enabled = False
 
-    collector = MetricsCollector(
-        ear_threshold=config.EAR_THRESHOLD,
-        mar_threshold=config.YAWN_THRESHOLD,
-        head_tilt_threshold=config.HEAD_TILT_THRESHOLD,
-        ear_consec_frames=config.EAR_CONSEC_FRAMES,
-        head_tilt_frames=config.HEAD_TILT_FRAMES
-    )
+    @property
+    def keyframe_period(self):
+        """Frames between tracker keyframes while the face is held (the detector runs on the next one)."""
+        tracker = self.detector.tracker
+        return None if tracker is None else tracker.keyframe_interval + 1
 
-    frame_count = 0
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
+    def reset(self):
+        self.detector.reset_state()
 
-        frame = manual_resize(frame, config.CAMERA_WIDTH, config.CAMERA_HEIGHT)
-        gray = manual_bgr_to_gray(frame)
-        gray_eq = analyzer.apply_clahe(gray)
+    def __call__(self, frame):
+        return self.detector.extract_landmarks(frame)
 
-        faces = cascade.detectMultiScale(gray_eq, scaleFactor=1.1, minNeighbors=5, minSize=(80, 80))
 
-        ear = mar = roll = pitch = 0.0
-        drowsy = False
+_chunk_extractor = None
 
-        if len(faces) > 0:
-            x, y, w, h = faces[0]
-            rect = dlib.rectangle(int(x), int(y), int(x + w), int(y + h))
-            dlib_faces = model_manager.detector(gray_eq)
-            if dlib_faces:
-                shape = predictor(gray_eq, dlib_faces[0])
-                shape_np = np.array([[p.x, p.y] for p in shape.parts()])
-                left_eye = shape_np[36:42]
-                right_eye = shape_np[42:48]
-                mouth = shape_np[48:68]
-                left_ear = analyzer.calculate_ear(left_eye)
-                right_ear = analyzer.calculate_ear(right_eye)
-                ear = (left_ear + right_ear) / 2.0
-                mar = analyzer.calculate_mar(mouth)
-                roll, pitch, _ = analyzer.calculate_head_pose(shape_np)
 
-                if ear < config.EAR_THRESHOLD:
-                    drowsy = True
+def _init_chunk_worker(face_detectors, tracking):
+    global _chunk_extractor
+    cv2.setNumThreads(1)
+    _chunk_extractor = _LandmarkExtractor(face_detectors, tracking)
 
-        collector.add_sample(ear, mar, roll, pitch, is_drowsy_ground_truth=drowsy)
-        frame_count += 1
 
-        if frame_count % 100 == 0:
-            logger.info(f"Đã xử lý {frame_count} frames...")
+def _extract_landmarks(extractor, video_path, start=0, stop=None, warmup=0, progress=False):
+    """Landmark records (LANDMARK_DTYPE) for frames [start, stop), seeking to ``start - warmup`` first.
 
+    The warm-up frames run through the extractor (so any per-stream state it keeps is primed)
+    but their results are dropped; the caller stitches chunks back together in frame order.
+    """
+    first = max(0, start - warmup)
+    period = getattr(extractor, 'keyframe_period', None)
+    if first and period:
+        # Start on the keyframe phase a serial run has while it keeps the face from frame 0
+        first -= first % period
+    extractor.reset()
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise IOError(f"Không thể mở video: {video_path}")
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    if first:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, first)
+    records = _GrowableArray(LANDMARK_DTYPE)
+    index = first
+    while stop is None or index < stop:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        box, score, shape_np = extractor(frame)
+        if index >= start:
+            record = empty_records(1)[0]
+            record['timestamp'] = index / fps
+            if shape_np is not None:
+                record['shape'] = shape_np
+                record['box'] = [int(v) for v in box]
+                record['score'] = score
+                record['valid'] = True
+            records.append(record)
+            if progress and len(records) % 100 == 0:
+                logger.info(f"Đã xử lý {len(records)} frames...")
+        index += 1
     cap.release()
+    return records.values.copy()
+
+
+def _extract_landmarks_chunked(video_path, workers, chunk_frames=None, warmup=0, face_detectors=None,
+                               tracking=True):
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise IOError(f"Không thể mở video: {video_path}")
+    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+    if total <= 0:
+        raise IOError(f"Không xác định được số frame của video: {video_path}")
+
+    chunk_frames = chunk_frames or -(-total // workers)
+    bounds = [(start, start + chunk_frames) for start in range(0, total, chunk_frames)]
+    # The frame count in the container header can be short; the last chunk reads to EOF
+    bounds[-1] = (bounds[-1][0], None)
+    logger.info(f"Chia video thành {len(bounds)} đoạn x {chunk_frames} frames cho {workers} tiến trình "
+                f"(warm-up {warmup} frames)")
+
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=min(workers, len(bounds)), initializer=_init_chunk_worker,
+                             initargs=(face_detectors, tracking)) as executor:
+        futures = [executor.submit(_run_chunk, video_path, start, stop, warmup) for start, stop in bounds]
+        chunks = []
+        for (start, stop), future in zip(bounds, futures):
+            chunk = future.result()
+            if stop is not None and len(chunk) != stop - start:
+                logger.warning(f"Đoạn [{start}, {stop}) chỉ đọc được {len(chunk)} frames (seek không chính xác?)")
+            chunks.append(chunk)
+            logger.info(f"Xong đoạn frames {start}-{start + len(chunk)}")
+    return np.concatenate(chunks) if chunks else empty_records()
+
+
+def _run_chunk(video_path, start, stop, warmup):
+    return _extract_landmarks(_chunk_extractor, video_path, start, stop, warmup)
+
+
+def evaluate_on_video(video_path, config, output_dir='evaluation_results', workers=1, chunk_frames=None,
+                      warmup_frames=None, face_detectors=None, cache_dir=None, face_tracking=None):
+    """Đánh giá pipeline trên một video có sẵn (real data).
+
+    Với workers > 1, video được chia thành các đoạn theo vị trí frame và trích xuất landmark song song;
+    trạng thái thời gian (eye_counter, head_tilt_counter, ...) luôn được chạy lại tuần tự trên toàn bộ
+    chuỗi đặc trưng. Face tracker chạy như khi triển khai thực tế (face_tracking, mặc định FACE_TRACKING):
+    mỗi đoạn bắt đầu sớm hơn warmup_frames frame (mặc định EVAL_CHUNK_WARMUP_FRAMES) để tracker hội tụ,
+    kết quả các frame warm-up bị bỏ; vài frame ngay sau điểm chia vẫn có thể lệch nhẹ so với chạy tuần tự.
+    face_tracking=False cho detector chạy trên mọi frame, khi đó kết quả trùng hoàn toàn với chạy tuần tự.
+    face_detectors chọn chuỗi detector (mặc định FACE_DETECTORS).
+    Khi bật FEATURE_CACHE, landmark được lưu theo (hash video, phiên bản model) trong cache_dir
+    (mặc định FEATURE_CACHE_DIR) và các lần đánh giá sau đọc lại thẳng từ cache.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+
+    if warmup_frames is None:
+        warmup_frames = config.EVAL_CHUNK_WARMUP_FRAMES
+    if face_tracking is None:
+        face_tracking = config.FACE_TRACKING
+    cache = None
+    records = None
+    try:
+        if config.FEATURE_CACHE:
+            cache = LandmarkCache(cache_dir, config, face_detectors, face_tracking)
+            records = cache.load(video_path)
+        if records is None:
+            if workers > 1:
+                records = _extract_landmarks_chunked(video_path, workers, chunk_frames, warmup_frames,
+                                                     face_detectors, face_tracking)
+            else:
+                extractor = _LandmarkExtractor(face_detectors, face_tracking)
+                records = _extract_landmarks(extractor, video_path, progress=True)
+            if cache is not None:
+                cache.save(video_path, records)
+    except IOError as e:
+        logger.error(str(e))
+        return
+
+    collector = MetricsCollector(
+        ear_threshold=config.EAR_THRESHOLD,
+        mar_threshold=config.YAWN_THRESHOLD,
+        head_tilt_threshold=config.HEAD_TILT_THRESHOLD,
+        ear_consec_frames=config.EAR_CONSEC_FRAMES,
+        head_tilt_frames=config.HEAD_TILT_FRAMES
+    )
+    features = landmark_features(records)
+    ear, mar, roll, pitch, face = features.T
+    drowsy = (face > 0) & (ear < config.EAR_THRESHOLD)
+    collector.add_samples(ear, mar, roll, pitch, is_drowsy_ground_truth=drowsy,
+                          timestamps=records['timestamp'])
+    frame_count = len(features)
 
     metrics = collector.compute_metrics()
     ear_analysis = collector.ear_sensitivity_analysis()
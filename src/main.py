@@ -6,7 +6,9 @@ import cv2
 import numpy as np
 import logging
 import time
-from src.core.detector import DrowsinessDetector, manual_resize
+from src.core.detector import DrowsinessDetector, manual_resize, combine_edge_maps
+from src.core.frame_pipeline import ThreadedDetector
+from src.core.frame_source import open_source
 from src.configs.config import Config
 
 logging.basicConfig(
@@ -41,22 +43,27 @@ def show_pipeline_windows(frame, metrics, detector):
 
     if detector._last_canny_left is not None and detector._last_canny_right is not None:
         if detector._last_canny_left.size > 0 and detector._last_canny_right.size > 0:
-            h_l, w_l = detector._last_canny_left.shape
-            h_r, w_r = detector._last_canny_right.shape
-            max_h = max(h_l, h_r)
-            combined = np.zeros((max_h, w_l + w_r), dtype=np.uint8)
-            combined[:h_l, :w_l] = detector._last_canny_left
-            combined[:h_r, w_l:w_l + w_r] = detector._last_canny_right
+            combined = combine_edge_maps(detector._last_canny_left, detector._last_canny_right)
             canny_big = manual_resize(combined, 320, 120)
             cv2.imshow("Canny Edges", canny_big)
 
 
-def run_detection(save_pipeline=False):
+def run_detection(save_pipeline=False, profile=False, profile_json=None, source=None, realtime=False):
     detector = DrowsinessDetector(save_pipeline=save_pipeline)
+    detector.block_on_models = False
     config = Config()
+    if source is not None:
+        detector.set_source(open_source(source, config, realtime=realtime))
+    if profile or profile_json:
+        detector.profiler.enabled = True
+    frames_shown = 0
+    processor = ThreadedDetector(detector) if config.THREADED_PIPELINE else None
 
     try:
-        detector.start_camera()
+        if processor:
+            processor.start()
+        else:
+            detector.start_camera()
     except Exception as e:
         logger.error(f"Failed to initialize camera: {e}")
         return
@@ -67,13 +74,29 @@ def run_detection(save_pipeline=False):
     cv2.resizeWindow("Camera", 640, 480)
 
     while True:
-        frame, alert, metrics = detector.process_frame()
+        if processor:
+            result = processor.latest(timeout=0.03)
+            if result is None:
+                continue
+            frame, alert, metrics = result
+        else:
+            frame, alert, metrics = detector.process_frame()
         if frame is None:
+            if not detector.source.realtime:
+                logger.info("End of recorded source")
+                break
             time.sleep(0.03)
             continue
 
-        draw_metrics_overlay(frame, metrics, config)
+        if metrics.get('models_ready', True):
+            draw_metrics_overlay(frame, metrics, config)
+        else:
+            cv2.putText(frame, "Loading models...", (20, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.6,
+                        (0, 255, 255), 1, cv2.LINE_AA)
         cv2.imshow("Camera", frame)
+        frames_shown += 1
+        if profile and frames_shown % config.PROFILE_REPORT_INTERVAL == 0:
+            logger.info("Stage timings:\n" + detector.profiler.summary_text())
 
         key = cv2.waitKey(1) & 0xFF
         if key == ord('q'):
@@ -82,9 +105,41 @@ def run_detection(save_pipeline=False):
             detector.save_pipeline = not detector.save_pipeline
             logger.info(f"Pipeline saving: {'ON' if detector.save_pipeline else 'OFF'}")
 
+    if processor:
+        processor.stop()
     detector.stop_camera()
     cv2.destroyAllWindows()
 
+    if profile:
+        logger.info("Stage timings:\n" + detector.profiler.summary_text())
+        logger.info("Model load times:\n" + detector.models.startup_report())
+    if profile_json:
+        detector.profiler.dump_json(profile_json)
+        logger.info(f"Stage timings written to {profile_json}")
+
+
+def run_multi_stream(specs, realtime=False, workers=None):
+    from src.core.multi_stream import MultiStreamDetector
+    config = Config()
+    service = MultiStreamDetector([open_source(spec, config, realtime=realtime) for spec in specs],
+                                  workers=workers or config.SESSION_WORKERS)
+    logger.info("Press 'q' to quit")
+
+    def show(results):
+        for index, (frame, _, metrics) in enumerate(results):
+            if frame is None:
+                continue
+            draw_metrics_overlay(frame, metrics, config)
+            cv2.imshow(f"Camera {index}", frame)
+        return (cv2.waitKey(1) & 0xFF) != ord('q')
+
+    try:
+        service.run(callback=show)
+    except Exception as e:
+        logger.error(f"Multi-stream detection failed: {e}")
+    cv2.destroyAllWindows()
+    logger.info(f"Batched face detection: {service.batched_frames} frames in {service.ticks} ticks")
+
 
 def run_calibration():
     config = Config()
@@ -134,9 +189,34 @@ def run_kivy():
 
 if __name__ == '__main__':
     import sys
-    if '--calibrate' in sys.argv:
+    if '--batch' in sys.argv and sys.argv.index('--batch') + 1 < len(sys.argv):
+        from src.evaluation.batch import run_batch
+        workers = None
+        if '--workers' in sys.argv and sys.argv.index('--workers') + 1 < len(sys.argv):
+            workers = int(sys.argv[sys.argv.index('--workers') + 1])
+        output_dir = 'batch_results'
+        if '--output' in sys.argv and sys.argv.index('--output') + 1 < len(sys.argv):
+            output_dir = sys.argv[sys.argv.index('--output') + 1]
+        run_batch(sys.argv[sys.argv.index('--batch') + 1], output_dir=output_dir, workers=workers)
+    elif '--calibrate' in sys.argv:
         run_calibration()
+    elif '--streams' in sys.argv and sys.argv.index('--streams') + 1 < len(sys.argv):
+        workers = None
+        if '--workers' in sys.argv and sys.argv.index('--workers') + 1 < len(sys.argv):
+            workers = int(sys.argv[sys.argv.index('--workers') + 1])
+        run_multi_stream(sys.argv[sys.argv.index('--streams') + 1].split(','),
+                         realtime='--realtime' in sys.argv, workers=workers)
     elif '--opencv' in sys.argv:
-        run_detection(save_pipeline='--save-pipeline' in sys.argv)
+        profile_json = None
+        if '--profile-json' in sys.argv and sys.argv.index('--profile-json') + 1 < len(sys.argv):
+            profile_json = sys.argv[sys.argv.index('--profile-json') + 1]
+        source = None
+        if '--source' in sys.argv and sys.argv.index('--source') + 1 < len(sys.argv):
+            source = sys.argv[sys.argv.index('--source') + 1]
+        run_detection(save_pipeline='--save-pipeline' in sys.argv,
+                      profile='--profile' in sys.argv,
+                      profile_json=profile_json,
+                      source=source,
+                      realtime='--realtime' in sys.argv)
     else:
         run_kivy()
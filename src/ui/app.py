@@ -11,6 +11,7 @@ from kivy.graphics import Color, Rectangle
 from kivy.core.audio import SoundLoader
 from kivy.uix.screenmanager import ScreenManager
 from src.core.detector import DrowsinessDetector
+from src.core.frame_pipeline import ThreadedDetector
 from src.configs.config import Config
 from src.configs.settings import Settings
 from src.ui.screens.main_screen import MainScreen
@@ -23,6 +24,8 @@ class DrowsinessDetectorApp(App):
         super().__init__()
         self.config = Config()
         self.detector = DrowsinessDetector()
+        self.detector.block_on_models = False
+        self.frame_processor = ThreadedDetector(self.detector) if self.config.THREADED_PIPELINE else None
         self.image = Image(size_hint=(1, 1))
         self.status_label = Label(text='Trạng thái: Đã dừng', size_hint=(1, 0.1))
         self.settings = Settings()
@@ -176,6 +179,13 @@ class DrowsinessDetectorApp(App):
             logging.error("Không thể bắt đầu giám sát: Camera chưa khởi tạo")
             return
         self.detector.reset_head_reference()
+        if self.frame_processor:
+            try:
+                self.frame_processor.start()
+            except Exception as e:
+                self.status_label.text = 'Lỗi: Không khởi tạo được camera'
+                logging.error(f"Không thể khởi động pipeline xử lý khung hình: {e}")
+                return
         self.is_monitoring = True
         self.status_label.text = 'Trạng thái: Đang giám sát'
         self.background_color = [0, 0, 0, 1]
@@ -185,6 +195,8 @@ class DrowsinessDetectorApp(App):
     def stop_monitoring(self, instance):
         # Dừng giám sát
         self.is_monitoring = False
+        if self.frame_processor:
+            self.frame_processor.stop()
         self.alert_active = False
         self.status_label.text = 'Trạng thái: Đã dừng'
         self.image.texture = None
@@ -256,6 +268,11 @@ class DrowsinessDetectorApp(App):
                 self._texture = Texture.create(size=(frame.shape[1], frame.shape[0]), colorfmt='bgr')
             self._texture.blit_buffer(cv2.flip(frame, 0).tobytes(), colorfmt='bgr', bufferfmt='ubyte')
             self.image.texture = self._texture
+            if ear is None:
+                # Model chưa tải xong: chưa bắt đầu tính thời gian hiệu chỉnh
+                self.calibration_start_time = Clock.get_time()
+                self.status_label.text = 'Trạng thái: Đang tải model...'
+                return
             remaining = int(duration - elapsed)
             self.status_label.text = f'Đang hiệu chỉnh... {remaining}s (Ngưỡng mắt: {ear:.2f})'
             main_screen = self.screen_manager.get_screen('main')
@@ -271,7 +288,14 @@ class DrowsinessDetectorApp(App):
     def update(self):
         # Cập nhật trạng thái giám sát
         try:
-            frame, alert_detected, metrics = self.detector.process_frame()
+            if self.frame_processor:
+                # Chỉ lấy kết quả đã xử lý xong từ luồng nền, không chặn luồng UI
+                result = self.frame_processor.latest()
+                if result is None:
+                    return
+                frame, alert_detected, metrics = result
+            else:
+                frame, alert_detected, metrics = self.detector.process_frame()
             ear = metrics.get('ear', self.last_metrics['ear'])
             mar = metrics.get('mar', self.last_metrics['mar'])
             roll_angle = metrics.get('roll_angle', self.last_metrics['roll_angle'])
@@ -331,6 +355,8 @@ class DrowsinessDetectorApp(App):
 
             elif not alert_detected and self.alert_active and not self.alert_stop_timer:
                 self.alert_stop_timer = Clock.schedule_once(self.stop_alert, self.alert_stop_delay)
+            elif not self.alert_active and not metrics.get('models_ready', True):
+                self.status_label.text = 'Trạng thái: Đang tải model...'
             elif not self.alert_active:
                 self.status_label.text = 'Trạng thái: Đang giám sát'
                 self.background_color = [0, 0, 0, 1]
@@ -419,6 +445,8 @@ class DrowsinessDetectorApp(App):
             self.fatigue_sound.stop()
         if self.calibration_event:
             self.calibration_event.cancel()
+        if self.frame_processor:
+            self.frame_processor.stop()
         self.detector.stop_camera()
         self.background_color = [0, 0, 0, 1]
         self.update_background_color()
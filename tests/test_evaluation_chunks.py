@@ -0,0 +1,101 @@
+import cv2
+import dlib
+import numpy as np
+import pytest
+
+from src.core.model_registry import ModelRegistry
+from src.evaluation import metrics
+
+
+class _Point:
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+
+
+class _Shape:
+    def __init__(self, points):
+        self._points = points
+
+    def parts(self):
+        return [_Point(int(x), int(y)) for x, y in self._points]
+
+
+def _bright_square(gray, upsample=0):
+    ys, xs = np.nonzero(gray > 128)
+    if len(xs) < 100:
+        return []
+    return [dlib.rectangle(int(xs.min()), int(ys.min()), int(xs.max()), int(ys.max()))]
+
+
+def _box_landmarks(image, rect):
+    # Points depend on the box they are fitted in, like the real predictor
+    u = np.linspace(0.1, 0.9, 68)
+    xs = rect.left() + u * rect.width()
+    ys = rect.top() + u[::-1] * rect.height()
+    return _Shape(np.stack([xs, ys], axis=1))
+
+
+class _SyntheticModels(ModelRegistry):
+    def _load_haar(self):
+        return None
+
+    def _load_dnn(self):
+        return None
+
+    def _load_cnn(self):
+        return None
+
+    def _load_hog(self):
+        return _bright_square
+
+    def _load_landmarks(self):
+        return _box_landmarks
+
+
+@pytest.fixture
+def synthetic_models(monkeypatch):
+    # Chunk workers are forked and pick up the shared registry from the parent
+    monkeypatch.setattr(ModelRegistry, "_shared", _SyntheticModels())
+
+
+@pytest.fixture
+def synthetic_clip(tmp_path):
+    path = str(tmp_path / "clip.avi")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 30.0, (640, 480))
+    for i in range(120):
+        frame = np.zeros((480, 640, 3), dtype=np.uint8)
+        if not 40 <= i < 50:
+            x = 150 + int(80 * np.sin(i / 7.0))
+            y = 100 + (i % 30) * 3
+            cv2.rectangle(frame, (x, y), (x + 160 + i % 17, y + 180), (255, 255, 255), -1)
+        writer.write(frame)
+    writer.release()
+    return path
+
+
+def test_chunked_extraction_matches_serial_without_tracking(synthetic_models, synthetic_clip):
+    serial = metrics._extract_landmarks(metrics._LandmarkExtractor(["hog"], tracking=False), synthetic_clip)
+    chunked = metrics._extract_landmarks_chunked(synthetic_clip, workers=3, chunk_frames=37,
+                                                 face_detectors=["hog"], tracking=False)
+
+    assert len(serial) == 120
+    assert serial['valid'].sum() == 110
+    np.testing.assert_array_equal(chunked, serial)
+
+
+def test_chunked_extraction_with_tracking_warms_up(synthetic_models, synthetic_clip):
+    serial = metrics._extract_landmarks(metrics._LandmarkExtractor(["hog"]), synthetic_clip)
+    chunked = metrics._extract_landmarks_chunked(synthetic_clip, workers=3, chunk_frames=37, warmup=30,
+                                                 face_detectors=["hog"])
+    cold = metrics._extract_landmarks_chunked(synthetic_clip, workers=3, chunk_frames=37, warmup=0,
+                                              face_detectors=["hog"])
+
+    assert len(chunked) == len(serial) == 120
+    np.testing.assert_array_equal(chunked['valid'], serial['valid'])
+    np.testing.assert_array_equal(chunked['timestamp'], serial['timestamp'])
+    # The tracker state at a chunk start is only approximated, so a few frames may still differ
+    differs = (chunked['shape'] != serial['shape']).any(axis=(1, 2)).sum()
+    differs_cold = (cold['shape'] != serial['shape']).any(axis=(1, 2)).sum()
+    assert differs < differs_cold
+    assert differs <= len(serial) // 10